@@ -0,0 +1,279 @@
+#audio_capture.py
+import sys
+import threading
+import time
+
+import numpy as np
+
+import config
+from audio_io import SAMPLE_RATE, read_wav
+from logger import logger
+
+# Audio capture without per-chunk allocation: sources push float32 blocks
+# into a preallocated ring buffer, and a finished utterance is handed out
+# as a slice of it. Sources are interchangeable (microphone, WAV file,
+# synthetic signal) so capture can be tested and benchmarked without a mic.
+
+BLOCK_DURATION = 0.1
+INPUT_DEVICE = config.VOICE.get("input_device")
+MAX_UTTERANCE_S = config.VOICE.get("max_utterance_s", 15)
+
+
+class RingBuffer:
+    """Fixed-size float32 ring buffer with contiguous reads.
+
+    Every sample is written twice, at i and i + capacity, so any window of
+    up to `capacity` recent samples is a single slice of the backing array
+    and can be returned as a view instead of being concatenated.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=np.float32)
+        self.written = 0  # total samples ever written; absolute sample index of the next one
+
+    def write(self, block):
+        n = len(block)
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        pos = self.written % self.capacity
+        first = min(n, self.capacity - pos)
+        data, cap = self._data, self.capacity
+        data[pos:pos + first] = block[:first]
+        data[pos + cap:pos + cap + first] = block[:first]
+        if first < n:
+            rest = n - first
+            data[:rest] = block[first:]
+            data[cap:cap + rest] = block[first:]
+        self.written += n
+
+    def view(self, start, end=None):
+        """Samples [start, end) by absolute index, as a view (valid until overwritten)."""
+        end = self.written if end is None else min(end, self.written)
+        # samples older than one capacity have been overwritten
+        start = min(max(start, self.written - self.capacity, 0), end)
+        pos = start % self.capacity
+        return self._data[pos:pos + (end - start)]
+
+    def latest(self, n):
+        return self.view(self.written - n)
+
+
+class AudioSource:
+    """Pushes mono float32 blocks to a callback until stopped or exhausted."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, block_duration=BLOCK_DURATION):
+        self.sample_rate = sample_rate
+        self.blocksize = int(block_duration * sample_rate)
+        self.finished = threading.Event()  # set when a finite source runs out
+
+    def start(self, callback):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class MicSource(AudioSource):
+    def __init__(self, device=INPUT_DEVICE, **kwargs):
+        super().__init__(**kwargs)
+        self.device = device
+        self._stream = None
+
+    def start(self, callback):
+        # imported here so WAV / synthetic capture works without PortAudio
+        import sounddevice as sd
+
+        def on_audio(indata, frames, time_info, status):
+            if status:
+                logger.debug(f"Audio input status: {status}")
+            callback(indata[:, 0])
+
+        self._stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.blocksize,
+            device=self.device,
+            callback=on_audio
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class ArraySource(AudioSource):
+    """Plays a prerecorded buffer block by block, in real time or as fast as possible."""
+
+    def __init__(self, audio, realtime=True, loop=False, **kwargs):
+        super().__init__(**kwargs)
+        self.audio = np.ascontiguousarray(audio, dtype=np.float32)
+        self.realtime = realtime
+        self.loop = loop
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self, callback):
+        step = self.blocksize / self.sample_rate
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            for start in range(0, len(self.audio), self.blocksize):
+                if self._stop.is_set():
+                    return
+                callback(self.audio[start:start + self.blocksize])
+                if self.realtime:
+                    next_at += step
+                    delay = next_at - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+            if not self.loop:
+                break
+        self.finished.set()
+
+    def start(self, callback):
+        self._stop.clear()
+        self.finished.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), name="jarvis-audio-source", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+
+class WavSource(ArraySource):
+    def __init__(self, path, **kwargs):
+        super().__init__(read_wav(path, kwargs.get("sample_rate", SAMPLE_RATE)), **kwargs)
+        self.path = path
+
+
+class SyntheticSource(ArraySource):
+    """Background noise with speech-like tone bursts at the given (start, length) seconds."""
+
+    def __init__(self, duration=5.0, bursts=((1.0, 1.0),), noise=0.002, level=0.2, seed=0, **kwargs):
+        sr = kwargs.get("sample_rate", SAMPLE_RATE)
+        rng = np.random.default_rng(seed)
+        audio = (noise * rng.standard_normal(int(duration * sr))).astype(np.float32)
+        for start, length in bursts:
+            t = np.arange(int(length * sr)) / sr
+            # a few harmonics with a syllable-rate envelope
+            tone = sum(np.sin(2 * np.pi * f * t) / (k + 1) for k, f in enumerate((180, 360, 720)))
+            envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t))
+            s = int(start * sr)
+            audio[s:s + len(t)] += (level * tone * envelope)[:len(audio) - s].astype(np.float32)
+        super().__init__(audio, **kwargs)
+
+
+class UtteranceSegmenter:
+    """Cuts a continuous block stream into utterances using a VAD.
+
+    feed() writes each block into the ring buffer and returns the
+    (start, end) sample spans of utterances that just ended, widened by
+    `prebuffer_s` of lead-in. audio(span) is a view into the ring, valid
+    until the ring wraps, so consumers that keep it must copy it.
+    """
+
+    def __init__(self, vad, sample_rate=SAMPLE_RATE, prebuffer_s=0.3, max_utterance_s=MAX_UTTERANCE_S, slack_s=2.0):
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.prebuffer = int(prebuffer_s * sample_rate)
+        self.max_samples = int(max_utterance_s * sample_rate)
+        self.ring = RingBuffer(int((max_utterance_s + prebuffer_s + slack_s) * sample_rate))
+        self.speech_start = None
+
+    def _span(self, end):
+        return max(self.speech_start - self.prebuffer, 0, self.ring.written - self.ring.capacity), end
+
+    def feed(self, block):
+        spans = []
+        self.ring.write(block)
+        for kind, sample in self.vad.process(block):
+            if kind == "start":
+                self.speech_start = sample
+            elif self.speech_start is not None:
+                spans.append(self._span(sample))
+                self.speech_start = None
+        if self.speech_start is not None and self.ring.written - self.speech_start >= self.max_samples:
+            # very long speech is cut into max-length pieces
+            spans.append(self._span(self.ring.written))
+            self.speech_start = self.ring.written + self.prebuffer
+        return spans
+
+    def current(self):
+        """Span of the utterance in progress so far, or None."""
+        if self.speech_start is None:
+            return None
+        return self._span(self.ring.written)
+
+    def trailing_silence(self):
+        return self.vad.trailing_silence() if self.speech_start is not None else 0
+
+    def end_now(self):
+        """End the utterance in progress without waiting for the VAD hangover."""
+        span = self.flush()
+        if span is not None:
+            self.vad.end_speech()
+        return span
+
+    def flush(self):
+        """Span of the utterance in progress (e.g. when the source ran out), or None."""
+        if self.speech_start is None:
+            return None
+        span = self._span(self.ring.written)
+        self.speech_start = None
+        return span
+
+    def audio(self, span):
+        return self.ring.view(*span)
+
+
+def benchmark(source, seconds=None):
+    """Drive a source into a ring buffer and report throughput and callback cost."""
+    ring = RingBuffer(int(MAX_UTTERANCE_S * source.sample_rate))
+    costs = []
+
+    def callback(block):
+        started = time.perf_counter()
+        ring.write(block)
+        costs.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    source.start(callback)
+    try:
+        source.finished.wait(seconds)
+    finally:
+        source.stop()
+    elapsed = time.perf_counter() - started
+
+    costs_us = np.array(costs) * 1e6 if costs else np.zeros(1)
+    return {
+        "samples": ring.written,
+        "blocks": len(costs),
+        "seconds": round(elapsed, 3),
+        "realtime_factor": round(ring.written / source.sample_rate / elapsed, 1) if elapsed else None,
+        "callback_us_p50": round(float(np.percentile(costs_us, 50)), 1),
+        "callback_us_p99": round(float(np.percentile(costs_us, 99)), 1),
+    }
+
+
+if __name__ == "__main__":
+    # python audio_capture.py [file.wav]  -> capture throughput, no microphone needed
+    if len(sys.argv) > 1:
+        src = WavSource(sys.argv[1], realtime=False)
+    else:
+        src = SyntheticSource(duration=600.0, bursts=[(i * 10.0 + 2, 2.0) for i in range(60)], realtime=False)
+    print(benchmark(src))
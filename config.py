@@ -2,11 +2,96 @@
 LLM = {
     "default_model": "gemma2",
     "ollama_executable": "ollama",
-    "ollama_timeout_s": 30 
+    "ollama_timeout_s": 30,
+    "ollama_url": "http://127.0.0.1:11434",
+    "use_http": True,  # if False (or the server is unreachable), fall back to `ollama run`
+    "keep_alive": "30m",  # how long Ollama keeps the model resident after a request
+    "http_pool_size": 2,
+    "planner_model": None,  # defaults to default_model
+    "reply_model": None,  # defaults to default_model
+    "warmup_on_start": True,  # preload the models right after jarvis-ready
+    "keep_alive_interval_s": 240,  # how often to re-check / re-warm them; keep below keep_alive
+    "warmup_timeout_s": 120,  # a cold model load from disk can take minutes
+    "combined_plan_reply": False,  # plan and reply in one generation; reply call only on failure/clarification
+    "fast_path_router": True,  # match common commands with rules before calling the planner
+    "router_min_confidence": 0.8,
+    "plan_cache": True,  # reuse validated plans for repeated commands (persisted in memory.db); not used with combined_plan_reply
+    "plan_cache_size": 256,
+    "plan_cache_ttl_s": 604800,
+    "prompt_token_budget": 4096  # per prompt; context and memory are trimmed to fit
 }
 
 ENGINE = {
     "stdin_read_timeout_s": 0.1,  
     "log_path": "jarvis.log",
-    "allow_raw_text": True  # if True, treat plain text input as {"command": "<text>"}
+    "allow_raw_text": True,  # if True, treat plain text input as {"command": "<text>"}
+    "stream_replies": False,  # default for requests without "stream"; emits {"type": "delta"} lines
+    "preload_heavy_modules": True,  # load whisper / TTS / pyautogui in the background after jarvis-ready
+    "max_workers": 4,  # requests handled concurrently
+    "max_pending": 16,  # accepted but unanswered requests before replying "busy"
+    "pipeline_threads": 8,
+    "stage_timeouts_s": {  # per decide() stage; a timed-out stage falls back instead of blocking the turn
+        "memory": 2,
+        "system_prompt": 2,
+        "plan": 35,
+        "tools": 20,
+        "reply": 35
+    }
+}
+
+MEMORY = {
+    "db_pool_size": 4,
+    "db_synchronous": "NORMAL",  # safe with WAL; commits no longer fsync the main db file
+    "db_cache_kb": 8192,
+    "db_busy_timeout_ms": 5000,
+    "db_statement_cache": 256,
+    "group_commit_ms": 20,  # memory writes are batched into one commit per window
+    "group_commit_max_batch": 256,
+    "persist_conversation": True,  # store every user/Jarvis turn in the conversation table
+    "conversation_token_budget": 600,  # recent turns kept verbatim per session
+    "conversation_summary_tokens": 200,  # rolling summary of older turns
+    "conversation_max_turns": 20,
+    "conversation_sessions": 32,  # sessions kept in memory; older ones reload from the DB
+    "recall_limit": 3,  # memories sent per prompt, besides the user's name
+    "semantic_index": True,  # vector recall next to FTS (needs numpy); stored as memory.vec.npy
+    "embedding": "hashed",  # "hashed" n-grams, or a local sentence-transformers model name/path
+    "embedding_dim": 512,
+    "semantic_min_score": 0.25,  # cosine similarity a semantic match needs
+    "keyword_min_ratio": 0.3,  # keyword matches need this share of the best match's BM25 score
+    "ttl_days": {"note": 90},  # per memory type; types not listed never expire
+    "max_rows": 5000,  # newest non-config memories kept by compaction
+    "conversation_ttl_days": 30,
+    "compact_interval_s": 21600,  # 0 disables background compaction
+    "compact_delay_s": 60,
+    "vacuum_free_ratio": 0.2
+}
+
+VOICE = {
+    "stt_backend": "whisper",  # "whisper", or "faster-whisper" (pip install faster-whisper) for int8 CPU inference
+    "stt_model": "small",  # tiny / base / small / medium ...: smaller is faster, less accurate
+    "stt_language": None,  # e.g. "en" skips language detection; None = auto
+    "stt_threads": None,  # CPU threads for inference; None = library default
+    "stt_compute_type": "int8",  # faster-whisper only: int8, int8_float32, float32
+    "stt_beam_size": 1,  # 1 = greedy decoding (fastest)
+    "wake_word_spotter": True,  # gate Whisper behind the template keyword spotter
+    "wake_templates_dir": "wake_templates",  # WAV recordings of "Jarvis"; empty = no gating
+    "wake_threshold": 0.3,  # DTW distance; tune with `python wake_word.py <fixtures>`
+    "wake_search_s": 2.0,
+    "wake_audit_rate": 0.0,  # share of rejected utterances still transcribed to count false rejects
+    "debug_wav_dir": None,  # e.g. "debug_audio": save every utterance sent to Whisper as a WAV
+    "input_device": None,  # sounddevice input device; None = system default
+    "max_utterance_s": 15,  # recording stops here even if the user keeps talking
+    "vad": "adaptive",  # "adaptive" (noise floor + spectral flux) or "fixed" (old 0.01 peak threshold)
+    "silence_duration_s": 1.2,  # VAD hangover: this much quiet ends the utterance
+    "vad_start_margin_db": 10.0,  # speech starts this far above the noise floor
+    "vad_continue_margin_db": 6.0,
+    "vad_flux_threshold": 0.15,
+    "vad_min_speech_s": 0.25,  # shorter bursts (clicks, bumps) never trigger
+    "vad_floor_rise_db_s": 2.0,
+    "continuous_listening": False,  # always-on mic; wake-word commands arrive as {"id": "voice-N"} requests
+    "listen_queue_size": 4,  # utterances waiting for Whisper; the oldest is dropped beyond this
+    "streaming_partials": True,  # voice_input and the listener decode while the user talks, emit {"type": "partial"} lines
+    "partial_interval_s": 0.8,
+    "partial_window_s": 10.0,  # partial decodes cover at most this much recent audio
+    "early_endpoint_s": 0.4  # commit a stable partial after this much silence instead of the full hangover
 }
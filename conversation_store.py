@@ -0,0 +1,167 @@
+#conversation_store.py
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import config
+import jarvis_memory
+from db import get_conn
+from logger import logger
+from prompt_builder import estimate_tokens
+
+# Short-term conversation context, one history per session (GUI client,
+# voice loop, ...). Each session keeps its recent turns in a deque bounded
+# by a token budget; turns that fall out are folded into a rolling summary
+# so the gist survives without growing the prompt. Turns and summaries are
+# persisted so a restarted engine picks up where it left off.
+
+TOKEN_BUDGET = config.MEMORY.get("conversation_token_budget", 600)
+MAX_TURNS = config.MEMORY.get("conversation_max_turns", 20)
+SUMMARY_TOKENS = config.MEMORY.get("conversation_summary_tokens", 200)
+MAX_SESSIONS = config.MEMORY.get("conversation_sessions", 32)
+PERSIST = config.MEMORY.get("persist_conversation", True)
+# a single turn never takes more than this share of the budget
+MAX_TURN_TOKENS = TOKEN_BUDGET // 2
+DEFAULT_SESSION = "default"
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s")
+
+
+def _clip(text, tokens):
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit - 3].rstrip() + "..."
+
+
+def _gist(role, text):
+    # first sentence of the turn, shortened; cheap and good enough to keep
+    # the thread of the conversation
+    first = _SENTENCE.split(text.strip(), 1)[0]
+    return f"{role}: {_clip(first, 30)}"
+
+
+class Session:
+    def __init__(self, name):
+        self.name = name
+        self.turns = deque(maxlen=MAX_TURNS)  # (role, text, tokens, created_at)
+        self.tokens = 0
+        self.summary = deque()  # gist lines, oldest first
+        self.summary_tokens = 0
+        self.summarized_until = 0.0
+
+    def append(self, role, text, created_at):
+        """Add a turn; returns True if older turns were folded into the summary."""
+        text = _clip(text.strip(), MAX_TURN_TOKENS)
+        folded = False
+        if len(self.turns) == self.turns.maxlen:
+            self._fold(self.turns.popleft())
+            folded = True
+        tokens = estimate_tokens(f"{role}: {text}")
+        self.turns.append((role, text, tokens, created_at))
+        self.tokens += tokens
+        while self.tokens > TOKEN_BUDGET and len(self.turns) > 1:
+            self._fold(self.turns.popleft())
+            folded = True
+        return folded
+
+    def _fold(self, turn):
+        role, text, tokens, created_at = turn
+        self.tokens -= tokens
+        line = _gist(role, text)
+        self.summary.append(line)
+        self.summary_tokens += estimate_tokens(line)
+        while self.summary_tokens > SUMMARY_TOKENS and len(self.summary) > 1:
+            self.summary_tokens -= estimate_tokens(self.summary.popleft())
+        self.summarized_until = max(self.summarized_until, created_at)
+
+    def lines(self):
+        out = []
+        if self.summary:
+            out.append("Earlier: " + " | ".join(self.summary))
+        out.extend(f"{role}: {text}" for role, text, _, _ in self.turns)
+        return out
+
+
+class ConversationStore:
+    def __init__(self, persist=PERSIST, max_sessions=MAX_SESSIONS):
+        self.persist = persist
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, name):
+        session = Session(name)
+        if not self.persist:
+            return session
+        # flush so turns still queued on the memory writer are visible
+        jarvis_memory.flush_writes()
+        try:
+            with get_conn() as conn:
+                row = conn.execute(
+                    "SELECT summary, summarized_until FROM conversation_summary WHERE session = ?",
+                    (name,)
+                ).fetchone()
+                if row:
+                    session.summary.extend(line for line in row[0].split("\n") if line)
+                    session.summary_tokens = sum(estimate_tokens(line) for line in session.summary)
+                    session.summarized_until = row[1]
+                # only the tail that can still fit, never the whole history
+                turns = conn.execute(
+                    """
+                    SELECT role, text, created_at FROM conversation
+                    WHERE session = ? AND created_at > ?
+                    ORDER BY id DESC LIMIT ?
+                    """,
+                    (name, session.summarized_until, MAX_TURNS)
+                ).fetchall()
+        except Exception:
+            logger.exception(f"Failed to load conversation '{name}'")
+            return session
+
+        for role, text, created_at in reversed(turns):
+            session.append(role, text, created_at)
+        if turns or row:
+            logger.info(f"Resumed conversation '{name}' ({len(session.turns)} turns)")
+        return session
+
+    def _get(self, name):
+        # called with the lock held
+        session = self._sessions.get(name)
+        if session is None:
+            session = self._sessions[name] = self._load(name)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(name)
+        return session
+
+    def add(self, name, role, text):
+        name = name or DEFAULT_SESSION
+        now = time.time()
+        with self._lock:
+            session = self._get(name)
+            folded = session.append(role, text, now)
+            summary = "\n".join(session.summary)
+            summarized_until = session.summarized_until
+        if not self.persist:
+            return
+
+        jarvis_memory.add_conversation_turn(name, role, text, created_at=now)
+        if folded:
+            jarvis_memory.save_conversation_summary(name, summary, summarized_until)
+
+    def context(self, name):
+        """Prompt lines for a session: rolling summary first, then recent turns."""
+        with self._lock:
+            return self._get(name or DEFAULT_SESSION).lines()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "tokens": {name: s.tokens + s.summary_tokens for name, s in self._sessions.items()},
+            }
+
+
+conversations = ConversationStore()
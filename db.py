@@ -1,11 +1,244 @@
 #db.py
+import queue
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+import config
+
 DB_PATH = Path(__file__).parent / "memory.db"
 
+POOL_SIZE = config.MEMORY.get("db_pool_size", 4)
+SYNCHRONOUS = config.MEMORY.get("db_synchronous", "NORMAL")
+CACHE_KB = config.MEMORY.get("db_cache_kb", 8192)
+BUSY_TIMEOUT_MS = config.MEMORY.get("db_busy_timeout_ms", 5000)
+STATEMENT_CACHE = config.MEMORY.get("db_statement_cache", 256)
+
+# bumped whenever init_db gains a migration for existing memory.db files
+SCHEMA_VERSION = 2
+
+# False if this SQLite build has no FTS5; memory search then falls back to LIKE
+HAS_FTS = True
+
+
+# words that say nothing about what a memory is about; left out of recall
+# queries and embeddings so "what's my job" is matched on "job" alone
+STOPWORDS = frozenset("""
+a about am an and are as at be been but by can could did do does for from had has have he her his how
+i if in is it its me my of on or our s she so that the their them there they this to was we were what
+when where which who whom why will with would you your yours
+""".split())
+
+
+def content_words(text):
+    """Lowercase words of text, minus stopwords, in order."""
+    return [w for w in re.findall(r"\w+", (text or "").lower()) if w not in STOPWORDS]
+
+
+def words_key(text):
+    """Lowercase words of text in order, without punctuation: the identity of
+    a free-text memory ("My sister is Anna." == "my sister is anna")."""
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+class ConnectionPool:
+    """Fixed-size pool of long-lived SQLite connections.
+
+    Connections are opened once in WAL mode with tuned pragmas and keep
+    their prepared-statement cache between uses. A connection is only
+    ever used by one thread at a time, but may move between threads.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size=-{int(CACHE_KB)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_MS)}")
+        conn.create_function("words_key", 1, words_key, deterministic=True)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # every connection is out (or leaked by a stuck thread): fail like
+        # a busy database instead of hanging the caller forever
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"no free database connection after {BUSY_TIMEOUT_MS} ms (pool size {self.size})"
+            ) from None
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                # the open transaction holds the write lock, so nobody else
+                # can commit between the version check and the commit
+                commit(conn)
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool():
+    path = str(DB_PATH)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
 def get_conn():
-    return sqlite3.connect(DB_PATH)
+    """Borrow a pooled connection: `with get_conn() as conn:`.
+
+    Commits on success, rolls back on error, then returns the connection
+    to the pool.
+    """
+    return get_pool().connection()
+
+# PRAGMA data_version on a dedicated connection changes whenever any other
+# connection commits, including this process's own pool connections. Those
+# commits are absorbed as they happen, so data_version() only moves when
+# another process wrote to the database.
+_watch_conn = None
+_watch_path = None
+_watch_raw = None
+_external_version = 0
+_watch_lock = threading.Lock()
+
+def _poll_locked():
+    global _watch_conn, _watch_path, _watch_raw, _external_version
+    path = str(DB_PATH)
+    if _watch_conn is None or _watch_path != path:
+        if _watch_conn is not None:
+            _watch_conn.close()
+        _watch_conn = sqlite3.connect(path, check_same_thread=False)
+        _watch_path = path
+        _watch_raw = None
+    raw = _watch_conn.execute("PRAGMA data_version").fetchone()[0]
+    if _watch_raw is not None and raw != _watch_raw:
+        _external_version += 1
+    _watch_raw = raw
+
+def _check_version():
+    with _watch_lock:
+        if _watch_conn is not None:
+            _poll_locked()
+
+def _absorb_own_commit():
+    global _watch_raw
+    with _watch_lock:
+        if _watch_conn is not None and _watch_path == str(DB_PATH):
+            _watch_raw = _watch_conn.execute("PRAGMA data_version").fetchone()[0]
+
+@contextmanager
+def own_writes():
+    """Writes committed inside (explicit commit(), VACUUM, ANALYZE) are
+    this process's own and do not move data_version()."""
+    _check_version()
+    try:
+        yield
+    finally:
+        _absorb_own_commit()
+
+def commit(conn):
+    """conn.commit() for pool connections; use it instead of committing directly."""
+    with own_writes():
+        conn.commit()
+
+def data_version():
+    """Changes when another process commits to the database."""
+    with _watch_lock:
+        _poll_locked()
+        return _external_version
+
+def close_all():
+    global _watch_conn
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+    with _watch_lock:
+        if _watch_conn is not None:
+            _watch_conn.close()
+            _watch_conn = None
+
+def init_fts(conn):
+    global HAS_FTS
+    try:
+        conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+            value,
+            content='memory',
+            content_rowid='id'
+        )
+        """)
+    except sqlite3.OperationalError:
+        HAS_FTS = False
+        return False
+
+    # keep the external-content index in sync with the memory table
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS memory_ai AFTER INSERT ON memory BEGIN
+        INSERT INTO memory_fts(rowid, value) VALUES (new.id, new.value);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS memory_ad AFTER DELETE ON memory BEGIN
+        INSERT INTO memory_fts(memory_fts, rowid, value) VALUES ('delete', old.id, old.value);
+    END
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS memory_au AFTER UPDATE OF value ON memory BEGIN
+        INSERT INTO memory_fts(memory_fts, rowid, value) VALUES ('delete', old.id, old.value);
+        INSERT INTO memory_fts(rowid, value) VALUES (new.id, new.value);
+    END
+    """)
+    return True
 
 def init_db():
     with get_conn() as conn:
@@ -18,4 +251,47 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS plan_cache (
+            key TEXT PRIMARY KEY,
+            plan TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversation (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session TEXT NOT NULL,
+            role TEXT NOT NULL,
+            text TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_session ON conversation(session, id)")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversation_summary (
+            session TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            summarized_until REAL NOT NULL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_key ON memory(key, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_created_at ON memory(created_at)")
+        has_fts = init_fts(conn)
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1 and has_fts:
+            # memory.db files from before the FTS index: index existing rows
+            conn.execute("INSERT INTO memory_fts(memory_fts) VALUES ('rebuild')")
+        if version < 2:
+            # keyed entries used to be appended on every write: keep the latest
+            conn.execute("""
+            DELETE FROM memory WHERE key IS NOT NULL AND id NOT IN (
+                SELECT max(id) FROM memory WHERE key IS NOT NULL GROUP BY type, key
+            )
+            """)
+        # one row per (type, key), so keyed writes can upsert
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_memory_type_key ON memory(type, key) WHERE key IS NOT NULL")
+        if has_fts and version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
@@ -0,0 +1,225 @@
+#intent_router.py
+import re
+import threading
+
+import config
+from logger import logger
+from tools import APP_ALIASES, APP_PATHS, WEB_BASE_URLS
+
+# Deterministic fast path in front of llm_plan: common one-shot commands
+# are matched with compiled patterns and mapped straight to tool actions.
+# Anything that is not a confident full-utterance match goes to the LLM.
+
+MIN_CONFIDENCE = config.LLM.get("router_min_confidence", 0.8)
+
+WAKE_PREFIX = re.compile(r"^(?:(?:hey|ok|okay)\s+)?(?:jarvis|jervis|jar vis)\b[\s,]*", re.I)
+POLITE_PREFIX = re.compile(r"^(?:please\s+|(?:can|could|would|will)\s+you\s+(?:please\s+)?)", re.I)
+POLITE_SUFFIX = re.compile(r"\s*(?:,?\s*please|for me)$", re.I)
+
+KNOWN_APPS = set(APP_PATHS) | set(APP_ALIASES) | set(APP_ALIASES.values())
+KNOWN_SITES = set(WEB_BASE_URLS)
+# the text to type is taken as said, with only the wake word and verb removed
+VERBATIM_RULES = {"type"}
+# multi-step requests ("open chrome and play ...") need the planner's ordering
+COMPOUND = re.compile(r"\b(?:and|then|also)\b|[,;]", re.I)
+MEDIA_FILLER = re.compile(r"\s+(?:song|video|music video)$", re.I)
+# "search for report.pdf in downloads" wants find_file, not a web search
+FILE_QUERY = re.compile(
+    r"\.(?:pdf|docx?|xlsx?|pptx?|txt|csv|json|xml|md|py|js|html?|zip|rar|7z|exe|msi|jpe?g|png|gif|mp3|mp4|wav|mkv|mov)\b"
+    r"|\b(?:files?|folders?|director(?:y|ies)|documents?)\b"
+    r"|\b(?:in|on|from)\s+(?:my\s+|the\s+)?(?:downloads|documents|desktop|pictures|music|videos|computer|pc|drive)\b",
+    re.I
+)
+
+SYSTEM_ACTIONS = {
+    "mute": "mute",
+    "mute the volume": "mute",
+    "mute the sound": "mute",
+    "mute volume": "mute",
+    "mute sound": "mute",
+    "volume up": "volume up",
+    "turn the volume up": "volume up",
+    "turn volume up": "volume up",
+    "turn up the volume": "volume up",
+    "increase the volume": "volume up",
+    "increase volume": "volume up",
+    "volume down": "volume down",
+    "turn the volume down": "volume down",
+    "turn volume down": "volume down",
+    "turn down the volume": "volume down",
+    "decrease the volume": "volume down",
+    "decrease volume": "volume down",
+    "lower the volume": "volume down",
+    "wifi on": "wifi on",
+    "turn on wifi": "wifi on",
+    "turn on the wifi": "wifi on",
+    "turn wifi on": "wifi on",
+    "wifi off": "wifi off",
+    "turn off wifi": "wifi off",
+    "turn off the wifi": "wifi off",
+    "turn wifi off": "wifi off",
+}
+
+MODES = {"developer", "casual", "silent", "normal"}
+
+
+def _action(tool, **args):
+    return {"tool": tool, "args": args}
+
+
+def _open(m):
+    target = m.group("target").lower()
+    target = re.sub(r"\s+(?:app|application|website|site)$", "", target)
+    if target in KNOWN_SITES:
+        return [_action("open_web", website=target)], 1.0
+    if target in KNOWN_APPS:
+        return [_action("open_app", app_name=target)], 1.0
+    # unknown target: could be an app, a site or a search, let the LLM decide
+    return [_action("open_app", app_name=target)], 0.5
+
+
+def _play(m):
+    site = m.group("site").lower()
+    query = MEDIA_FILLER.sub("", m.group("query").strip())
+    if site not in KNOWN_SITES or not query:
+        return None
+    if query.lower() in {"something", "anything", "this", "this playlist", "music"}:
+        return [_action("open_web", website=site)], 0.6
+    return [_action("open_web", website=site, query=query)], 0.95
+
+
+def _search_site(m):
+    site = m.group("site").lower()
+    if site not in KNOWN_SITES:
+        return None
+    return [_action("open_web", website=site, query=m.group("query").strip())], 0.95
+
+
+def _search(m):
+    query = m.group("query").strip()
+    if FILE_QUERY.search(query):
+        # probably a file on this machine: let the planner pick find_file
+        return [_action("google_search", query=query)], 0.4
+    return [_action("google_search", query=query)], 0.9
+
+
+def _type(m):
+    return [_action("type_text", text=m.group("text"))], 1.0
+
+
+def _system(m):
+    action = SYSTEM_ACTIONS.get(re.sub(r"[\s-]+", " ", m.group(0).lower()).replace("wi fi", "wifi"))
+    if not action:
+        return None
+    return [_action("system_control", action=action)], 1.0
+
+
+def _minimize(m):
+    return [_action("minimize_all")], 1.0
+
+
+def _close(m):
+    target = (m.group("target") or "").lower()
+    if target in {"", "this", "it", "this window", "the window", "window", "this app"}:
+        return [_action("close_app")], 0.9
+    if target in KNOWN_APPS:
+        return [_action("close_app", app_name=target)], 0.95
+    return None
+
+
+def _focus(m):
+    target = m.group("target").lower()
+    if target not in KNOWN_APPS:
+        return None
+    return [_action("focus_app", app_name=target)], 0.9
+
+
+def _mode(m):
+    mode = m.group("mode").lower()
+    if mode not in MODES:
+        return None
+    return [_action("set_mode", mode=mode)], 1.0
+
+
+# (name, pattern, builder, allows_compound); first matching rule wins
+RULES = [
+    ("type", re.compile(r"^type(?:\s+out)?\s+(?P<text>.+)$", re.I | re.S), _type, True),
+    ("mode", re.compile(r"^(?:enter|switch to|activate|go to|use)\s+(?P<mode>\w+)\s+mode$", re.I), _mode, False),
+    ("play", re.compile(r"^(?:play|watch|listen to)\s+(?P<query>.+?)\s+on\s+(?P<site>\w+)$", re.I), _play, False),
+    ("search_site", re.compile(r"^search\s+(?:for\s+)?(?P<query>.+?)\s+on\s+(?P<site>\w+)$", re.I), _search_site, False),
+    ("search", re.compile(r"^(?:search(?:\s+for)?|google|look up)\s+(?P<query>.+)$", re.I), _search, False),
+    ("system", re.compile(
+        r"^(?:mute(?:\s+(?:the\s+)?(?:volume|sound))?"
+        r"|(?:turn\s+(?:the\s+)?volume|volume)\s+(?:up|down)"
+        r"|turn\s+(?:up|down)\s+the\s+volume"
+        r"|(?:increase|decrease|lower)\s+(?:the\s+)?volume"
+        r"|wi-?fi\s+(?:on|off)"
+        r"|turn\s+(?:on|off)\s+(?:the\s+)?wi-?fi"
+        r"|turn\s+wi-?fi\s+(?:on|off))$", re.I), _system, False),
+    ("minimize_all", re.compile(r"^(?:minimi[sz]e\s+(?:all(?:\s+(?:the\s+)?windows)?|everything)|show(?:\s+the)?\s+desktop)$", re.I), _minimize, False),
+    ("close", re.compile(r"^close(?:\s+(?P<target>.+))?$", re.I), _close, False),
+    ("focus", re.compile(r"^(?:switch to|focus(?:\s+on)?|go to)\s+(?P<target>.+)$", re.I), _focus, False),
+    ("open", re.compile(r"^(?:open|launch|start|run)\s+(?:up\s+)?(?:the\s+)?(?P<target>.+)$", re.I), _open, False),
+]
+
+_stats_lock = threading.Lock()
+ROUTER_STATS = {"hits": 0, "misses": 0, "rules": {}}
+
+
+def _strip_prefixes(message: str):
+    text = WAKE_PREFIX.sub("", message.strip())
+    return POLITE_PREFIX.sub("", text)
+
+
+def normalize(message: str):
+    text = _strip_prefixes(" ".join(message.split()))
+    text = text.rstrip(" .!?")
+    text = POLITE_SUFFIX.sub("", text)
+    return text
+
+
+def _record(rule):
+    with _stats_lock:
+        if rule is None:
+            ROUTER_STATS["misses"] += 1
+        else:
+            ROUTER_STATS["hits"] += 1
+            ROUTER_STATS["rules"][rule] = ROUTER_STATS["rules"].get(rule, 0) + 1
+
+
+def route(message: str):
+    """Return {"actions": [...]} for a confident match, or None to fall back to llm_plan."""
+    text = normalize(message)
+    verbatim = _strip_prefixes(message)
+    compound = bool(COMPOUND.search(text))
+    if text:
+        for name, pattern, build, allows_compound in RULES:
+            if compound and not allows_compound:
+                continue
+            m = pattern.match(verbatim if name in VERBATIM_RULES else text)
+            if not m:
+                continue
+            matched = build(m)
+            if matched is None:
+                continue
+            actions, confidence = matched
+            if confidence < MIN_CONFIDENCE:
+                logger.debug(f"Router rule '{name}' below threshold ({confidence}), using planner")
+                break
+            logger.info(f"Router fast path '{name}': {actions}")
+            _record(name)
+            return {"actions": actions}
+
+    _record(None)
+    return None
+
+
+def get_stats():
+    with _stats_lock:
+        total = ROUTER_STATS["hits"] + ROUTER_STATS["misses"]
+        return {
+            "hits": ROUTER_STATS["hits"],
+            "misses": ROUTER_STATS["misses"],
+            "hit_rate": round(ROUTER_STATS["hits"] / total, 3) if total else 0.0,
+            "rules": dict(ROUTER_STATS["rules"]),
+        }
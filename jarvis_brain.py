@@ -1,11 +1,21 @@
 #jarvis_brain.py
 import subprocess
+import asyncio
+import codecs
+import functools
 import json
-from jarvis_tts import speak
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from jarvis_tts import speak, SentenceStreamer
 from tools import open_app, google_search, type_text, open_web, system_control, find_file, clipboard, reminder, set_mode
-from jarvis_memory import add_memory, get_all_memory, find_memory_by_key, delete_memory_by_id
+from jarvis_memory import get_config, forget_memories, recall
+from conversation_store import conversations
 import config
 from logger import logger
+from ollama_client import get_client, CONNECTION_ERRORS
+import intent_router
+from plan_cache import plan_cache, catalog_hash, make_key
+from prompt_builder import PromptBuilder
 import time
 from tools.window_tools import(
     active_app,
@@ -23,11 +33,45 @@ CONVERSATION_TIMEOUT = 20  # seconds
 
 OLLAMA = config.LLM.get("ollama_executable", "ollama")
 DEFAULT_MODEL = config.LLM.get("default_model", "gemma2")
+PLANNER_MODEL = config.LLM.get("planner_model") or DEFAULT_MODEL
+REPLY_MODEL = config.LLM.get("reply_model") or DEFAULT_MODEL
 OLLAMA_TIMEOUT = config.LLM.get("ollama_timeout_s", 30)
+USE_HTTP = config.LLM.get("use_http", True)
+COMBINED_PLAN_REPLY = config.LLM.get("combined_plan_reply", False)
+FAST_PATH_ROUTER = config.LLM.get("fast_path_router", True)
+USE_PLAN_CACHE = config.LLM.get("plan_cache", True)
+
+# decide pipeline
+
+STAGE_TIMEOUTS = config.ENGINE.get("stage_timeouts_s", {})
+CANCEL_POLL_S = 0.05
+
+# shared across event loops so a timed-out stage never blocks asyncio.run teardown
+_executor = ThreadPoolExecutor(
+    max_workers=config.ENGINE.get("pipeline_threads", 8),
+    thread_name_prefix="jarvis-stage"
+)
+
+
+class DecisionCancelled(Exception):
+    pass
+
+
+class StageTimeout(Exception):
+    pass
+
+
+# For default jarvis
+DEFAULT_SYSTEM_PROMPT = """
+You are Jarvis, a calm, intelligent, and professional AI assistant.
+Address the user as "sir" naturally (at most once per response).
+Be concise, confident, and polished.
+Do not mention tools, code, or technical details.
+"""
 
 
 def get_jarvis_system_prompt():
-    mode = find_memory_by_key("mode") or "normal"
+    mode = get_config("mode") or "normal"
 
     if mode == "developer":
         return """
@@ -51,13 +95,8 @@ Keep responses extremely short.
 Only speak when necessary.
 """
 
-    # For default jarvis
-    return """
-You are Jarvis, a calm, intelligent, and professional AI assistant.
-Address the user as "sir" naturally (at most once per response).
-Be concise, confident, and polished.
-Do not mention tools, code, or technical details.
-"""
+    return DEFAULT_SYSTEM_PROMPT
+
 
 
 
@@ -193,55 +232,51 @@ TOOL_REGISTRY = {
     "minimize_all": minimize_all
 }
 
-# Short term memory
-
-SHORT_TERM_CONTEXT = []
-MAX_CONTEXT = 6
+# changes whenever the tool catalog does, so stale cached plans stop matching
+CATALOG_HASH = catalog_hash(TOOL_DEFINITIONS, TOOL_REGISTRY)
 
+# Short term memory
 
-def add_to_short_term(role, text):
-    SHORT_TERM_CONTEXT.append(f"{role}: {text}")
-    if len(SHORT_TERM_CONTEXT) > MAX_CONTEXT:
-        SHORT_TERM_CONTEXT.pop(0)
+def add_to_short_term(role, text, session=None):
+    conversations.add(session, role, text)
 
 
-def get_short_term_context():
-    return "\n".join(SHORT_TERM_CONTEXT) if SHORT_TERM_CONTEXT else ""
+def get_short_term_context(session=None):
+    return "\n".join(conversations.context(session))
 
 
 # Long term memory
 
 def get_relevant_memory(message):
-    memories = get_all_memory()
-    if not memories:
-        return []
+    return recall(message)
 
-    words = set(message.lower().split())
-    scored = []
 
-    for mem_id, mem_type, content, key in memories:
-        score = len(words & set(content.lower().split()))
-        if key == "name":
-            score += 5
-        if score > 0:
-            scored.append((score, content))
+def forget_memory(keyword, dry_run=False):
+    rows = forget_memories(keyword, dry_run=dry_run)
+    return [value for _, _, _, value in rows]
 
-    scored.sort(reverse=True)
-    return [c for _, c in scored[:5]]
 
+# ollama things
 
-def forget_memory(keyword):
-    removed = []
-    for mem_id, _, content, key in get_all_memory():
-        if keyword.lower() in content.lower():
-            delete_memory_by_id(mem_id)
-            removed.append(content)
-    return removed
+def call_ollama(prompt, model=None):
+    model = model or DEFAULT_MODEL
+    if USE_HTTP:
+        try:
+            return get_client().generate(prompt, model).strip()
+        except TimeoutError as e:
+            # the server is up but slow; the CLI would hit the same wall
+            logger.error(f"Ollama HTTP request timed out: {e}")
+            return f"[ERROR] {e}"
+        except CONNECTION_ERRORS as e:
+            logger.warning(f"Ollama HTTP API unavailable ({e}), falling back to CLI")
+        except Exception as e:
+            logger.exception("Ollama failed")
+            return f"[ERROR] {e}"
 
+    return call_ollama_cli(prompt, model)
 
-# ollama things
 
-def call_ollama(prompt, model=None):
+def call_ollama_cli(prompt, model=None):
     cmd = [OLLAMA, "run", model or DEFAULT_MODEL]
     try:
         proc = subprocess.run(
@@ -259,17 +294,75 @@ def call_ollama(prompt, model=None):
         return f"[ERROR] {e}"
 
 
-# planning
+def call_ollama_stream(prompt, model=None):
+    """Like call_ollama, but yields the completion piece by piece."""
+    model = model or DEFAULT_MODEL
+    if USE_HTTP:
+        started = False
+        try:
+            for token in get_client().generate_stream(prompt, model):
+                started = True
+                yield token
+            return
+        except TimeoutError as e:
+            logger.error(f"Ollama HTTP stream timed out: {e}")
+            if not started:
+                yield f"[ERROR] {e}"
+            return
+        except CONNECTION_ERRORS as e:
+            if started:
+                logger.error(f"Ollama HTTP stream broke mid-reply: {e}")
+                return
+            logger.warning(f"Ollama HTTP API unavailable ({e}), falling back to CLI")
+        except Exception as e:
+            logger.exception("Ollama failed")
+            if not started:
+                yield f"[ERROR] {e}"
+            return
 
-def llm_plan(message: str):
-    prompt = f"""
-You are a strict JSON command planner for Jarvis.
+    yield from call_ollama_cli_stream(prompt, model)
 
-{TOOL_DEFINITIONS}
 
-User request:
-"{message}"
+def call_ollama_cli_stream(prompt, model=None):
+    cmd = [OLLAMA, "run", model or DEFAULT_MODEL]
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+    except Exception as e:
+        logger.exception("Ollama failed")
+        yield f"[ERROR] {e}"
+        return
+
+    killer = threading.Timer(OLLAMA_TIMEOUT, proc.kill)
+    killer.start()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        proc.stdin.write(prompt.encode("utf-8"))
+        proc.stdin.close()
+        while True:
+            chunk = proc.stdout.read1(256)
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    finally:
+        killer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+
+# planning
 
+PLANNER_RULES = """
 IMPORTANT OUTPUT RULES (MANDATORY):
 - Return ONLY valid JSON.
 - The top-level key MUST be "actions".
@@ -277,7 +370,7 @@ IMPORTANT OUTPUT RULES (MANDATORY):
 - Each action MUST be an object with keys: "tool" and "args".
 - NEVER return plain text, explanations, or comments.
 - NEVER return strings inside "actions".
-- If no tool is needed, return exactly: {{ "actions": [] }}.
+- If no tool is needed, return exactly: { "actions": [] }.
 
 ARGUMENT RULES:
 - Include ONLY the arguments required for the selected tool.
@@ -287,62 +380,182 @@ ARGUMENT RULES:
 EXAMPLES:
 
 Example 1 (open app):
-{{
+{
   "actions": [
-    {{
+    {
       "tool": "open_app",
-      "args": {{ "app_name": "chrome" }}
-    }}
+      "args": { "app_name": "chrome" }
+    }
   ]
-}}
+}
 
 Example 2 (media with clear query):
-{{
+{
   "actions": [
-    {{
+    {
       "tool": "open_web",
-      "args": {{
+      "args": {
         "website": "youtube",
         "query": "interstellar soundtrack"
-      }}
-    }}
+      }
+    }
   ]
-}}
+}
 
 Example 3 (media but ambiguous query):
-{{
+{
   "actions": [
-    {{
+    {
       "tool": "open_web",
-      "args": {{
+      "args": {
         "website": "spotify"
-      }}
-    }}
+      }
+    }
   ]
-}}
-
-Now return ONLY the JSON object:
+}
 """
 
 
-    raw = call_ollama(prompt)
+def llm_plan(message: str, model=None):
+    prompt = (
+        PromptBuilder("plan")
+        .static("You are a strict JSON command planner for Jarvis.")
+        .static(TOOL_DEFINITIONS)
+        .static(PLANNER_RULES)
+        .add("User request:", f'"{message}"', required=True)
+        .add("", "Now return ONLY the JSON object:", required=True)
+        .build()
+    )
+
+    raw = call_ollama(prompt, model or PLANNER_MODEL)
+    parsed = parse_plan_json(raw)
+    if parsed is None:
+        return {"actions": []}
+    return {"actions": parsed["actions"]}
+
+
+def parse_plan_json(raw):
     start = raw.find("{")
     end = raw.rfind("}") + 1
-    if start == -1 or end == -1:
+    if start == -1 or end == 0:
         logger.error("No JSON found in LLM output")
-        return {"actions": []}
+        return None
 
     try:
         parsed = json.loads(raw[start:end])
         actions = parsed.get("actions", [])
         if not isinstance(actions, list):
             logger.error("Actions is not a list")
-            return {"actions": []}
+            return None
 
-        return {"actions": actions}
+        parsed["actions"] = actions
+        return parsed
     except Exception:
         logger.error("Failed to parse planner JSON")
-        return {"actions": []}
+        return None
+
+
+COMBINED_RULES = """
+IMPORTANT OUTPUT RULES (MANDATORY):
+- Return ONLY valid JSON with the keys "actions", "reply" and "needs_clarification".
+- "actions" MUST be a list of objects with keys: "tool" and "args".
+- "reply" is what Jarvis says out loud, assuming the actions succeed.
+- If no tool is needed, "actions" is [] and "reply" answers the user directly.
+- If the request is ambiguous, set "needs_clarification" to true.
+- NEVER return plain text, explanations, or comments outside the JSON.
+
+ARGUMENT RULES:
+- Include ONLY the arguments required for the selected tool.
+- Omit optional arguments if they are unclear or ambiguous.
+- Do NOT invent values.
+
+EXAMPLE:
+{
+  "actions": [
+    {
+      "tool": "open_web",
+      "args": {
+        "website": "youtube",
+        "query": "interstellar soundtrack"
+      }
+    }
+  ],
+  "reply": "Playing the Interstellar soundtrack on YouTube, sir.",
+  "needs_clarification": false
+}
+"""
+
+
+def llm_plan_and_reply(message: str, model=None, memories=None, system_prompt=None, session=None):
+    """One generation that returns both the actions and a provisional spoken reply."""
+    if memories is None:
+        memories = get_relevant_memory(message)
+    if system_prompt is None:
+        system_prompt = get_jarvis_system_prompt()
+
+    prompt = (
+        PromptBuilder("plan_reply")
+        .static(system_prompt)
+        .static("You also act as a strict JSON command planner.")
+        .static(TOOL_DEFINITIONS)
+        .static(COMBINED_RULES)
+        .add("Recent context:", conversations.context(session), priority=2, keep="tail")
+        .add("Relevant memory:", memories, priority=1)
+        .add("User request:", f'"{message}"', required=True)
+        .add("", "Now return ONLY the JSON object:", required=True)
+        .build()
+    )
+
+    raw = call_ollama(prompt, model or PLANNER_MODEL)
+    parsed = parse_plan_json(raw)
+    if parsed is None:
+        return {"actions": [], "reply": "", "needs_clarification": True}
+
+    reply = parsed.get("reply")
+    return {
+        "actions": parsed["actions"],
+        "reply": reply.strip() if isinstance(reply, str) else "",
+        "needs_clarification": bool(parsed.get("needs_clarification"))
+    }
+
+
+
+def is_valid_plan(actions):
+    if not actions:
+        return False
+    for action in actions:
+        if not isinstance(action, dict) or action.get("tool") not in TOOL_REGISTRY:
+            return False
+        if not isinstance(action.get("args", {}), dict):
+            return False
+    return True
+
+
+def get_plan(message: str, model=None, memories=None, system_prompt=None, session=None):
+    # rule-based fast path first, the LLM planner only for what it can't match
+    if FAST_PATH_ROUTER:
+        plan = intent_router.route(message)
+        if plan is not None:
+            return plan
+
+    key = None
+    # the combined planner also sees conversation and memories, so the same
+    # words ("open it") can mean a different plan next time
+    if USE_PLAN_CACHE and not COMBINED_PLAN_REPLY:
+        key = make_key(message, model or PLANNER_MODEL, CATALOG_HASH)
+        cached = plan_cache.get(key)
+        if cached is not None:
+            logger.info("Plan cache hit")
+            return {"actions": cached}
+
+    if COMBINED_PLAN_REPLY:
+        plan = llm_plan_and_reply(message, model, memories, system_prompt, session)
+    else:
+        plan = llm_plan(message, model)
+
+    if key and not plan.get("needs_clarification") and is_valid_plan(plan["actions"]):
+        plan_cache.put(key, plan["actions"])
+    return plan
 
 
 
@@ -375,40 +588,97 @@ def execute_plan(actions):
 
 # jarvis response
 
-def jarvis_reply(message, context=""):
-    memories = get_relevant_memory(message)
-    short_term = get_short_term_context()
-
-    prompt = f"""
-{get_jarvis_system_prompt()}
-
-Recent context:
-{short_term}
-
-Relevant memory:
-{chr(10).join(memories)}
-
-Context:
-{context}
-
-User said:
-{message}
-
-Respond as Jarvis:
-"""
-
+def jarvis_reply(message, context="", on_delta=None, memories=None, system_prompt=None, model=None, session=None,
+                 abort=None):
+    if memories is None:
+        memories = get_relevant_memory(message)
+    if system_prompt is None:
+        system_prompt = get_jarvis_system_prompt()
+
+    prompt = (
+        PromptBuilder("reply")
+        .static(system_prompt)
+        .add("Recent context:", conversations.context(session), priority=2, keep="tail")
+        .add("Relevant memory:", memories, priority=1)
+        .add("Context:", context, required=True)
+        .add("User said:", message, required=True)
+        .add("", "Respond as Jarvis:", required=True)
+        .build()
+    )
+
+    if on_delta:
+        parts = []
+        stream = call_ollama_stream(prompt, model or REPLY_MODEL)
+        try:
+            for token in stream:
+                parts.append(token)
+                on_delta(token)
+        finally:
+            # releases the HTTP connection / kills the CLI if on_delta aborted us
+            stream.close()
+        reply = "".join(parts).strip()
+    else:
+        reply = call_ollama(prompt, model or REPLY_MODEL)
 
-    reply = call_ollama(prompt)
+    if abort is not None and abort.is_set():
+        # the caller already gave up on this turn; keep it out of the history
+        return reply
 
-    add_to_short_term("User", message)
-    add_to_short_term("Jarvis", reply)
+    add_to_short_term("User", message, session)
+    add_to_short_term("Jarvis", reply, session)
 
     return reply
 
 
 # decide function
 
-def decide(message: str, model=None):
+def summarize_results(actions, results):
+    errors = [r for r in results if r.get("status") == "error"]
+
+    if actions and not results:
+        return "No actions could be executed"
+    if not errors:
+        return f"Actions executed: {', '.join(a['tool'] for a in actions)}"
+    if len(errors) < len(actions):
+        return "Some requested actions were completed, but others could not be."
+    return "I was unable to complete the requested actions."
+
+
+async def run_stage(name, func, *args, cancel_event=None, **kwargs):
+    """Run a blocking call on the stage executor with the stage's timeout.
+
+    Raises StageTimeout or DecisionCancelled; the worker thread itself
+    cannot be interrupted, its result is simply dropped.
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    timeout = STAGE_TIMEOUTS.get(name)
+    deadline = None if timeout is None else loop.time() + timeout
+    started = time.perf_counter()
+
+    try:
+        while True:
+            wait = CANCEL_POLL_S
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.error(f"Stage '{name}' timed out after {timeout}s")
+                    raise StageTimeout(name)
+                wait = min(wait, remaining)
+
+            done, _ = await asyncio.wait({fut}, timeout=wait)
+            if done:
+                return fut.result()
+            if cancel_event is not None and cancel_event.is_set():
+                raise DecisionCancelled(name)
+    except BaseException:
+        fut.cancel()
+        raise
+    finally:
+        logger.debug(f"Stage '{name}' took {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+async def decide_async(message: str, model=None, on_delta=None, cancel_event=None, session=None):
     global CONVERSATION_ACTIVE, LAST_CONVERSATION_TIME
 
     now = time.time()
@@ -417,59 +687,135 @@ def decide(message: str, model=None):
     if CONVERSATION_ACTIVE and now - LAST_CONVERSATION_TIME > CONVERSATION_TIMEOUT:
         CONVERSATION_ACTIVE = False
 
-    logger.info(f"User: {message}")
-    for a in ["shutdown","exit"]:
-        if (message.lower()).find(a)!=-1:
-            reply=jarvis_reply(message)
-            speak(reply)
-            time.sleep(6)
-            return {
-            "reply": reply,
-            "tool": "meta",
-            "result": {"shutdown":True}
-            }
-    
-    plan = llm_plan(message)
-    actions = plan.get("actions", [])
-
-    results = execute_plan(actions)
-
-    errors=[]
-    for a in results:
-        if a.get("status") == "error":
-            errors.append(a)
-
-    if len(errors)==0:
-        context = (
-        f"Actions executed: {', '.join(a['tool'] for a in actions)}"
-        )
-    
-    elif len(errors)>0 and len(errors)<len(actions):
-        context = "Some requested actions were completed, but others could not be."
+    # when streaming, speak each sentence as soon as it has been generated
+    streamer = SentenceStreamer() if on_delta else None
+    # set when the reply stage is given up on; its worker thread keeps running
+    abandoned = threading.Event()
 
-    elif len(errors)==len(actions):
-        context = "I was unable to complete the requested actions."
+    def stream_token(token):
+        if abandoned.is_set() or (cancel_event is not None and cancel_event.is_set()):
+            raise DecisionCancelled("reply")
+        streamer.feed(token)
+        on_delta(token)
 
-    if actions and not results:
-        context = "No actions could be executed"
+    emit = stream_token if on_delta else None
 
-    if not actions:
-        clarification_prompt = (
-          "Ask a short, polite clarification question if needed. "
-          "Do not execute any action yet."
-        )
-        reply = jarvis_reply(message, clarification_prompt)
-    else:
-        reply = jarvis_reply(message, context)
+    def stage(name, func, *args, **kwargs):
+        return run_stage(name, func, *args, cancel_event=cancel_event, **kwargs)
 
-    CONVERSATION_ACTIVE = True
-    LAST_CONVERSATION_TIME = time.time()
+    async def reply_stage(*args, **kwargs):
+        try:
+            return await stage("reply", jarvis_reply, *args, on_delta=emit, abort=abandoned, **kwargs)
+        except (StageTimeout, DecisionCancelled):
+            # stop the late deltas, speech and history of the abandoned reply
+            abandoned.set()
+            if streamer:
+                streamer.discard()
+            raise
+
+    # these only feed the reply prompt, so they overlap with planning
+    memory_task = asyncio.ensure_future(stage("memory", get_relevant_memory, message))
+    system_task = asyncio.ensure_future(stage("system_prompt", get_jarvis_system_prompt))
+
+    async def memories_and_prompt():
+        try:
+            memories = await memory_task
+        except StageTimeout:
+            memories = []
+        try:
+            system_prompt = await system_task
+        except StageTimeout:
+            # not None: jarvis_reply would then build it again, synchronously
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+        return memories, system_prompt
 
-    speak(reply)
+    try:
+        logger.info(f"User: {message}")
+        for a in ["shutdown","exit"]:
+            if (message.lower()).find(a)!=-1:
+                memories, system_prompt = await memories_and_prompt()
+                try:
+                    reply = await reply_stage(
+                        message, memories=memories, system_prompt=system_prompt, model=model, session=session
+                    )
+                except StageTimeout:
+                    reply = "Shutting down, sir."
+                if streamer:
+                    streamer.finish()
+                else:
+                    speak(reply)
+                await asyncio.sleep(6)
+                return {
+                "reply": reply,
+                "tool": "meta",
+                "result": {"shutdown":True}
+                }
+
+        if COMBINED_PLAN_REPLY:
+            # the combined prompt needs memory and persona up front
+            memories, system_prompt = await memories_and_prompt()
+            plan_coro = stage("plan", get_plan, message, model, memories, system_prompt, session)
+        else:
+            plan_coro = stage("plan", get_plan, message, model)
 
-    return {
-        "reply": reply,
-        "tool": [a["tool"] for a in actions],
-        "result": results
-    }
+        try:
+            plan = await plan_coro
+        except StageTimeout:
+            plan = {"actions": []}
+        actions = plan.get("actions", [])
 
+        try:
+            results = await stage("tools", execute_plan, actions)
+        except StageTimeout:
+            results = [{
+                "tool": a.get("tool") if isinstance(a, dict) else None,
+                "status": "error",
+                "message": "timed out"
+            } for a in actions]
+
+        errors = [r for r in results if r.get("status") == "error"]
+        context = summarize_results(actions, results)
+
+        if plan.get("reply") and not errors and not plan.get("needs_clarification") and (results or not actions):
+            # combined mode: the provisional reply still holds, skip the second call
+            reply = plan["reply"]
+            add_to_short_term("User", message, session)
+            add_to_short_term("Jarvis", reply, session)
+            if emit:
+                emit(reply)
+        else:
+            if not actions:
+                context = (
+                  "Ask a short, polite clarification question if needed. "
+                  "Do not execute any action yet."
+                )
+            memories, system_prompt = await memories_and_prompt()
+            try:
+                reply = await reply_stage(
+                    message, context, memories=memories, system_prompt=system_prompt, model=model, session=session
+                )
+            except StageTimeout:
+                reply = "[ERROR] reply timed out"
+
+        CONVERSATION_ACTIVE = True
+        LAST_CONVERSATION_TIME = time.time()
+
+        if streamer:
+            streamer.finish()
+        else:
+            speak(reply)
+
+        return {
+            "reply": reply,
+            "tool": [a["tool"] for a in actions],
+            "result": results
+        }
+    finally:
+        for task in (memory_task, system_task):
+            if not task.done():
+                task.cancel()
+
+
+def decide(message: str, model=None, on_delta=None, cancel_event=None, session=None):
+    # sync entry point for existing callers; async callers await decide_async
+    return asyncio.run(decide_async(message, model, on_delta, cancel_event, session))
@@ -1,25 +1,449 @@
 #jarvis_memory.py
-from db import get_conn, init_db, DB_PATH
-import sqlite3
+from db import get_conn, init_db
+import atexit
+import config
+import db
+import json
+import queue
+import re
+import threading
+import time
+from logger import logger
 
 init_db()
 
-def add_memory(mem_type: str, value: str, key: str | None = None):
+try:
+    import memory_vectors
+except ImportError:  # numpy missing: keyword recall only
+    memory_vectors = None
+
+GROUP_COMMIT_MS = config.MEMORY.get("group_commit_ms", 20)
+SEMANTIC_INDEX = config.MEMORY.get("semantic_index", True) and memory_vectors is not None
+SEMANTIC_MIN_SCORE = config.MEMORY.get("semantic_min_score", 0.25)
+KEYWORD_MIN_RATIO = config.MEMORY.get("keyword_min_ratio", 0.3)
+RECALL_LIMIT = config.MEMORY.get("recall_limit", 3)
+RRF_K = 60
+GROUP_COMMIT_MAX_BATCH = config.MEMORY.get("group_commit_max_batch", 256)
+
+
+def _row_id(cur):
+    # upserts report the affected row through RETURNING id; lastrowid is
+    # stale when the conflict branch updated an existing row
+    if cur.description:
+        row = cur.fetchone()
+        return row[0] if row else None
+    return cur.lastrowid
+
+
+class MemoryWriter:
+    """Background writer that batches memory writes into group commits.
+
+    Writes are queued and committed together once the first one has
+    waited GROUP_COMMIT_MS (or the batch is full), so callers never wait
+    on an fsync. flush() is a barrier for reads that must see them.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="jarvis-memory-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, sql, params=(), on_commit=None):
+        """Queue a write. on_commit(row id) runs on the writer thread once it is durable."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("memory writer is shut down")
+            self._ensure_started()
+            self._pending += 1
+            self._queue.put(("exec", sql, params, on_commit))
+
+    def flush(self, timeout=None):
+        with self._lock:
+            if self._pending == 0 or self._closed:
+                return True
+            done = threading.Event()
+            self._queue.put(("barrier", done))
+        return done.wait(timeout)
+
+    def shutdown(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + GROUP_COMMIT_MS / 1000
+        while len(batch) < GROUP_COMMIT_MAX_BATCH:
+            # a barrier or shutdown means someone is waiting: commit now
+            if batch[-1] is None or batch[-1][0] == "barrier":
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, writes):
+        if not writes:
+            return
+        done = []
+        try:
+            with get_conn() as conn:
+                for sql, params, on_commit in writes:
+                    done.append((on_commit, _row_id(conn.execute(sql, params))))
+        except Exception:
+            logger.exception("Group commit failed, retrying writes one by one")
+            done = []
+            for sql, params, on_commit in writes:
+                try:
+                    with get_conn() as conn:
+                        row_id = _row_id(conn.execute(sql, params))
+                    done.append((on_commit, row_id))
+                except Exception:
+                    logger.exception(f"Dropping memory write: {sql}")
+
+        for on_commit, rowid in done:
+            if on_commit is None:
+                continue
+            try:
+                on_commit(rowid)
+            except Exception:
+                logger.exception("Memory write callback failed")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = self._collect(self._queue.get())
+            # drain what is already queued behind a shutdown sentinel
+            if batch[-1] is None:
+                stopping = True
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        batch.append(item)
+
+            writes = [item[1:] for item in batch if item is not None and item[0] == "exec"]
+            self._commit(writes)
+
+            with self._lock:
+                self._pending -= len(writes)
+            for item in batch:
+                if item is not None and item[0] == "barrier":
+                    item[1].set()
+
+
+writer = MemoryWriter()
+
+
+def flush_writes(timeout=None):
+    return writer.flush(timeout)
+
+
+def shutdown():
+    writer.shutdown()
+
+
+atexit.register(shutdown)
+
+_vector_index = None
+_vector_lock = threading.Lock()
+# index changes made while the index is being loaded, replayed onto it
+# once it is published so a write that commits in between is not lost
+_vector_pending = None
+_pending_lock = threading.Lock()
+
+
+def get_vector_index():
+    """The semantic index, loaded (and reconciled with the DB) on first use."""
+    global _vector_index, _vector_pending
+    if not SEMANTIC_INDEX:
+        return None
+    with _vector_lock:
+        if _vector_index is None:
+            with _pending_lock:
+                _vector_pending = []
+            flush_writes()
+            with get_conn() as conn:
+                rows = conn.execute("SELECT id, value FROM memory WHERE type != 'config'").fetchall()
+            index = memory_vectors.VectorIndex(db.DB_PATH)
+            index.load(rows)
+            with _pending_lock:
+                for op, args in _vector_pending:
+                    getattr(index, op)(*args)
+                _vector_index = index
+                _vector_pending = None
+        return _vector_index
+
+
+def _index_change(op, *args):
+    # before loading starts, load() picks the change up from the DB
+    with _pending_lock:
+        if _vector_index is not None:
+            getattr(_vector_index, op)(*args)
+        elif _vector_pending is not None:
+            _vector_pending.append((op, args))
+
+
+def _index_add(mem_id, value):
+    _index_change("add", mem_id, value)
+
+
+def _index_remove(mem_ids):
+    _index_change("remove", list(mem_ids))
+
+
+def drop_from_caches(mem_ids, config_changed=False):
+    """Forget deleted rows in the vector index and, if needed, the config cache."""
+    global _config_cache
+    if mem_ids:
+        _index_remove(mem_ids)
+    if config_changed:
+        with _config_lock:
+            _config_cache = None
+
+
+# Config memories (mode, ...) are read on every reply, so they are served
+# from an in-process cache. Writes here update it directly; writes by
+# other processes are noticed through PRAGMA data_version.
+_config_cache = None
+_config_version = None
+_config_lock = threading.Lock()
+
+
+def _load_config():
+    flush_writes()
     with get_conn() as conn:
-        conn.execute(
+        rows = conn.execute(
+            "SELECT key, value FROM memory WHERE type = 'config' AND key IS NOT NULL"
+        ).fetchall()
+    return dict(rows)
+
+
+def get_config(key: str, default=None):
+    global _config_cache, _config_version
+    with _config_lock:
+        version = db.data_version()
+        if _config_cache is None or version != _config_version:
+            _config_cache = _load_config()
+            _config_version = version
+        return _config_cache.get(key, default)
+
+
+def _config_write_through(key, value):
+    # our own commits do not move data_version, so the cache is updated here
+    with _config_lock:
+        if _config_cache is not None:
+            if value is None:
+                _config_cache.pop(key, None)
+            else:
+                _config_cache[key] = value
+
+
+def set_config(key: str, value: str):
+    add_memory("config", value, key=key)
+
+
+def add_memory(mem_type: str, value: str, key: str | None = None):
+    """Store a memory.
+
+    Keyed entries are upserted (one row per type and key). A free-text
+    entry with the same words as an existing one (case and punctuation
+    ignored) replaces its wording instead of adding a row.
+    """
+    on_commit = None
+    if mem_type != "config":
+        on_commit = lambda mem_id: mem_id is not None and _index_add(mem_id, value)
+
+    if key is not None:
+        writer.submit(
+            """
+            INSERT INTO memory (type, key, value) VALUES (?, ?, ?)
+            ON CONFLICT (type, key) WHERE key IS NOT NULL
+            DO UPDATE SET value = excluded.value, created_at = CURRENT_TIMESTAMP
+            RETURNING id
+            """,
+            (mem_type, key, value),
+            on_commit
+        )
+        if mem_type == "config":
+            _config_write_through(key, value)
+        return
+
+    if mem_type == "config":
+        writer.submit(
             "INSERT INTO memory (type, key, value) VALUES (?, ?, ?)",
-            (mem_type, key, value)
+            (mem_type, key, value),
+            on_commit
+        )
+        return
+
+    # both run in the same group commit, in order: refresh a repeat, else insert
+    writer.submit(
+        """
+        UPDATE memory SET value = ?, created_at = CURRENT_TIMESTAMP
+        WHERE key IS NULL AND type = ? AND words_key(value) = words_key(?)
+        RETURNING id
+        """,
+        (value, mem_type, value),
+        on_commit
+    )
+    writer.submit(
+        """
+        INSERT INTO memory (type, key, value)
+        SELECT ?, NULL, ? WHERE NOT EXISTS (
+            SELECT 1 FROM memory WHERE key IS NULL AND type = ? AND words_key(value) = words_key(?)
         )
-        conn.commit()
+        RETURNING id
+        """,
+        (mem_type, value, mem_type, value),
+        on_commit
+    )
+
+
+def add_conversation_turn(session: str, role: str, text: str, created_at: float | None = None):
+    writer.submit(
+        "INSERT INTO conversation (session, role, text, created_at) VALUES (?, ?, ?, ?)",
+        (session, role, text, created_at or time.time())
+    )
+
+
+def save_conversation_summary(session: str, summary: str, summarized_until: float):
+    writer.submit(
+        """
+        INSERT INTO conversation_summary (session, summary, summarized_until) VALUES (?, ?, ?)
+        ON CONFLICT (session) DO UPDATE SET
+            summary = excluded.summary, summarized_until = excluded.summarized_until
+        """,
+        (session, summary, summarized_until)
+    )
 
 def get_all_memory():
+    flush_writes()
     with get_conn() as conn:
         cur = conn.execute(
             "SELECT type, key, value, created_at FROM memory ORDER BY created_at DESC"
         )
         return cur.fetchall()
 
+def _fts_query(text: str):
+    # quote every word so user text can never be parsed as FTS syntax
+    words = dict.fromkeys(db.content_words(text))
+    return " OR ".join(f'"{w}"' for w in words)
+
+
+def _name_rows(conn):
+    return conn.execute(
+        "SELECT id, value FROM memory WHERE key = 'name' ORDER BY created_at DESC LIMIT 1"
+    ).fetchall()
+
+
+def _keyword_rows(conn, text, limit):
+    query = _fts_query(text)
+    if not query:
+        return []
+    if db.HAS_FTS:
+        rows = conn.execute(
+            """
+            SELECT m.id, m.value, -bm25(memory_fts) AS score FROM memory_fts
+            JOIN memory m ON m.id = memory_fts.rowid
+            WHERE memory_fts MATCH ?
+            ORDER BY score DESC
+            LIMIT ?
+            """,
+            (query, limit)
+        ).fetchall()
+        # bm25 has no absolute scale: drop matches far weaker than the best one
+        cutoff = rows[0][2] * KEYWORD_MIN_RATIO if rows else 0
+        return [(mem_id, value) for mem_id, value, score in rows if score >= cutoff]
+
+    words = list(dict.fromkeys(db.content_words(text)))
+    return conn.execute(
+        "SELECT id, value FROM memory WHERE "
+        + " OR ".join("lower(value) LIKE ?" for _ in words)
+        + " ORDER BY created_at DESC LIMIT ?",
+        [f"%{w}%" for w in words] + [limit]
+    ).fetchall()
+
+
+def _dedupe(names, rows, limit):
+    # the name entries come first and do not count against the limit
+    seen = {mem_id for mem_id, _ in names}
+    results = []
+    for mem_id, value in rows:
+        if mem_id in seen:
+            continue
+        seen.add(mem_id)
+        results.append(value)
+    return [value for _, value in names] + results[:limit]
+
+
+def search_memory(text: str, limit: int = 5):
+    """Return up to `limit` memory values relevant to text, best first.
+
+    The latest entry keyed "name" always comes first, on top of `limit`;
+    the rest are ranked by BM25 over the memory_fts index.
+    """
+    flush_writes()
+    with get_conn() as conn:
+        names = _name_rows(conn)
+        rows = _keyword_rows(conn, text, limit)
+    return _dedupe(names, rows, limit)
+
+
+def recall(text: str, limit: int = RECALL_LIMIT):
+    """Like search_memory, but fuses BM25 with semantic (vector) similarity.
+
+    Both rankings are merged with reciprocal rank fusion, so a memory that
+    only paraphrases the request can still be recalled.
+    """
+    index = get_vector_index()
+    if index is None:
+        return search_memory(text, limit)
+
+    flush_writes()
+    semantic = index.search(text, k=limit * 2, min_score=SEMANTIC_MIN_SCORE)
+    with get_conn() as conn:
+        names = _name_rows(conn)
+        keyword = _keyword_rows(conn, text, limit * 2)
+
+        fused = {}
+        for ranking in ([mem_id for mem_id, _ in keyword], [mem_id for mem_id, _ in semantic]):
+            for rank, mem_id in enumerate(ranking):
+                fused[mem_id] = fused.get(mem_id, 0.0) + 1.0 / (RRF_K + rank)
+        best = sorted(fused, key=fused.get, reverse=True)[:limit]
+
+        values = dict(keyword)
+        missing = [i for i in best if i not in values]
+        if missing:
+            values.update(conn.execute(
+                "SELECT id, value FROM memory WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(missing),)
+            ).fetchall())
+
+    return _dedupe(names, [(i, values[i]) for i in best if i in values], limit)
+
+
 def find_memory_by_key(key: str):
+    flush_writes()
     with get_conn() as conn:
         cur = conn.execute(
             "SELECT value FROM memory WHERE key = ? ORDER BY created_at DESC LIMIT 1",
@@ -28,15 +452,63 @@ def find_memory_by_key(key: str):
         row = cur.fetchone()
         return row[0] if row else None
     
+def forget_memories(keyword: str, dry_run: bool = False):
+    """Delete every memory whose value contains keyword, in one transaction.
+
+    Candidates come from the FTS index (word-prefix match) and are then
+    checked for the case-insensitive substring. Returns the matched rows
+    as (id, type, key, value); with dry_run nothing is deleted.
+    """
+    needle = keyword.strip().lower()
+    if not needle:
+        return []
+
+    flush_writes()
+    words = re.findall(r"\w+", needle)
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if db.HAS_FTS and words:
+            rows = conn.execute(
+                """
+                SELECT m.id, m.type, m.key, m.value FROM memory_fts
+                JOIN memory m ON m.id = memory_fts.rowid
+                WHERE memory_fts MATCH ? AND instr(lower(m.value), ?) > 0
+                """,
+                (" AND ".join(f'"{w}"*' for w in words), needle)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id, type, key, value FROM memory WHERE instr(lower(value), ?) > 0",
+                (needle,)
+            ).fetchall()
+
+        if rows and not dry_run:
+            conn.execute(
+                "DELETE FROM memory WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([r[0] for r in rows]),)
+            )
+        else:
+            conn.rollback()
+
+    if not dry_run and rows:
+        drop_from_caches([r[0] for r in rows], any(r[1] == "config" for r in rows))
+    return rows
+
+
 def delete_memory_by_id(mem_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM memory WHERE id = ?", (mem_id,))
-    conn.commit()
-    conn.close()
+    writer.submit(
+        "DELETE FROM memory WHERE id = ?",
+        (mem_id,),
+        lambda _: _index_remove([mem_id])
+    )
 
 
 def clear_memory():
-    with get_conn() as conn:
-        conn.execute("DELETE FROM memory")
-        conn.commit()
+    global _config_cache, _config_version
+    writer.submit("DELETE FROM memory")
+    flush_writes()
+    if _vector_index is not None:
+        _vector_index.clear()
+    with _config_lock:
+        _config_cache = {}
+        _config_version = db.data_version()
@@ -1,32 +1,87 @@
 #jarvis_tts.py
-import pyttsx3
+import queue
+import re
 import threading
 from logger import logger
 
-VOICE_INDEX = 1   
-RATE = 165        
+VOICE_INDEX = 1
+RATE = 165
 VOLUME = 1.0
 
+# one worker speaks queued utterances in order, so streamed sentences
+# never talk over each other
+_speech_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _say(text):
+    try:
+        # imported here so the engine starts without loading the speech driver
+        import pyttsx3
+        engine = pyttsx3.init()
+        voices = engine.getProperty("voices")
+
+        if VOICE_INDEX < len(voices):
+            engine.setProperty("voice", voices[VOICE_INDEX].id)
+
+        engine.setProperty("rate", RATE)
+        engine.setProperty("volume", VOLUME)
+
+        engine.say(text)
+        engine.runAndWait()
+        engine.stop()
+    except Exception:
+        logger.exception("TTS failed")
+
+
+def preload():
+    import pyttsx3  # noqa: F401
+
+
+def _run():
+    while True:
+        text = _speech_queue.get()
+        _say(text)
+        _speech_queue.task_done()
+
 
 def speak(text: str):
+    global _worker
     if not text:
         return
 
-    def _run():
-        try:
-            engine = pyttsx3.init()
-            voices = engine.getProperty("voices")
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, daemon=True)
+            _worker.start()
+
+    _speech_queue.put(text)
+
+
+class SentenceStreamer:
+    """Collects streamed LLM tokens and speaks each sentence as soon as it is complete."""
 
-            if VOICE_INDEX < len(voices):
-                engine.setProperty("voice", voices[VOICE_INDEX].id)
+    def __init__(self):
+        self.buffer = ""
 
-            engine.setProperty("rate", RATE)
-            engine.setProperty("volume", VOLUME)
+    def feed(self, token: str):
+        self.buffer += token
+        parts = SENTENCE_END.split(self.buffer)
+        if len(parts) == 1:
+            return
+        for sentence in parts[:-1]:
+            speak(sentence.strip())
+        self.buffer = parts[-1]
 
-            engine.say(text)
-            engine.runAndWait()
-            engine.stop()
-        except Exception:
-            logger.exception("TTS failed")
+    def discard(self):
+        # drop an unfinished sentence, e.g. of a reply that was abandoned
+        self.buffer = ""
 
-    threading.Thread(target=_run, daemon=True).start()
+    def finish(self):
+        rest = self.buffer.strip()
+        self.buffer = ""
+        if rest:
+            speak(rest)
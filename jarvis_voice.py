@@ -1,25 +1,43 @@
 #jarvis_voice.py
-import sounddevice as sd
-import numpy as np
-import whisper
-import tempfile
-import wave
+import threading
 import time
+from pathlib import Path
+import config
+from audio_io import write_wav
+from audio_capture import MicSource, UtteranceSegmenter, MAX_UTTERANCE_S
+from vad import make_vad
+from logger import logger
+from wake_word import spotter
+from stt_backends import get_backend
 
-model = whisper.load_model("small")
 SAMPLE_RATE = 16000
 CHUNK_DURATION = 0.1
-SILENCE_THRESHOLD = 0.01
-SILENCE_DURATION = 1.2
+SILENCE_DURATION = config.VOICE.get("silence_duration_s", 1.2)
 PREBUFFER_DURATION = 0.3
+WAKE_WORD_SPOTTER = config.VOICE.get("wake_word_spotter", True)
+DEBUG_WAV_DIR = config.VOICE.get("debug_wav_dir")
+STREAMING = config.VOICE.get("streaming_partials", True)
 
-def wait_for_wake_word_audio(timeout=5):
+_noise_floor_db = None
+
+
+def get_model():
+    # the configured STT backend (whisper / faster-whisper), loaded on first
+    # use so a text-only engine never pays for it
+    return get_backend()
+
+
+def wait_for_wake_word_audio(timeout=5, source=None):
     start = time.monotonic()
-    while time.monotonic() - start < timeout:
-        audio = record_audio_silence()
+    while True:
+        remaining = timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            return None
+        audio = record_audio_silence(source, timeout=remaining)
         if audio is not None and len(audio) > SAMPLE_RATE * 0.3:
             return audio
-    return None
+        if source is not None and source.finished.is_set():
+            return None
 
 
 def contains_wake_word(text):
@@ -37,68 +55,79 @@ def contains_wake_word(text):
 
     return any(w in text for w in wake_words)
 
-def record_audio_silence():
-    input_audio_chunks=[]
-    prebuffer_chunks = []
-    silence_time = 0.0
-    input_silence_start_time = None
-    max_prebuffer_chunks = int(PREBUFFER_DURATION / CHUNK_DURATION)
-    speech_detected = False
-    recording_active = True
-
-    def callback(indata, frames, time_info, status):
-        nonlocal silence_time, speech_detected, input_silence_start_time, recording_active
-
-        chunk=indata.copy()
-
-        volume = np.max(np.abs(indata))
-
-        prebuffer_chunks.append(chunk)
-
-        if len(prebuffer_chunks) > max_prebuffer_chunks:
-            prebuffer_chunks.pop(0)
-
-        if not speech_detected:
-            if volume > SILENCE_THRESHOLD:
-                speech_detected = True
-                input_audio_chunks.extend(prebuffer_chunks)
-        else:
-
-            input_audio_chunks.append(chunk)
-
-            if volume < SILENCE_THRESHOLD:
-                if input_silence_start_time is None:
-                    input_silence_start_time = time.monotonic()
-                elif time.monotonic() - input_silence_start_time >= 0.6:
-
-                    recording_active = False
-                    raise sd.CallbackStop()
-            else:
-                input_silence_start_time = None
-
-    with sd.InputStream(
-        samplerate=SAMPLE_RATE,
-        channels=1,
-        dtype="float32",
-        blocksize=int(CHUNK_DURATION * SAMPLE_RATE),
-        callback=callback
-    ):
-        while recording_active:
-            sd.sleep(50)
-        
-    audio = np.concatenate(input_audio_chunks, axis=0)
-    return np.squeeze(audio)
-
-
-def save_temp_wav(audio_data, sr=SAMPLE_RATE):
-    temp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    with wave.open(temp.name, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(sr)
-        pcm = (audio_data * 32767).astype(np.int16)
-        wf.writeframes(pcm.tobytes())
-    return temp.name
+def make_segmenter(sample_rate=SAMPLE_RATE):
+    vad = make_vad(hangover_s=SILENCE_DURATION)
+    if _noise_floor_db is not None and hasattr(vad, "floor_db"):
+        # start from the room noise learned during the previous recording
+        vad.floor_db = _noise_floor_db
+    return UtteranceSegmenter(
+        vad, sample_rate,
+        prebuffer_s=PREBUFFER_DURATION,
+        max_utterance_s=MAX_UTTERANCE_S,
+        slack_s=SILENCE_DURATION + 1.0
+    )
+
+
+def remember_noise_floor(segmenter):
+    global _noise_floor_db
+    _noise_floor_db = getattr(segmenter.vad, "floor_db", None)
+
+
+def record_audio_silence(source=None, timeout=None):
+    """Record one utterance from source (the microphone by default).
+
+    Blocks are written into a preallocated ring buffer and run through the
+    VAD; the utterance is returned as a slice of the ring, including
+    PREBUFFER_DURATION of lead-in. timeout only limits the wait for speech
+    to start; an utterance in progress is always recorded to its end.
+    Returns None if nothing was said before timeout or the source ran out.
+    """
+    source = source or MicSource(block_duration=CHUNK_DURATION)
+    segmenter = make_segmenter(source.sample_rate)
+    span = None
+    done = threading.Event()
+
+    def callback(block):
+        nonlocal span
+        if done.is_set():
+            return
+        spans = segmenter.feed(block)
+        if spans:
+            span = spans[0]
+            done.set()
+
+    source.start(callback)
+    try:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.is_set():
+            if source.finished.is_set():
+                span = segmenter.flush()
+                break
+            wait = 0.1
+            if deadline is not None and segmenter.speech_start is None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    break
+            done.wait(wait)
+    finally:
+        source.stop()
+        remember_noise_floor(segmenter)
+
+    if span is None:
+        return None
+    return segmenter.audio(span)
+
+
+def save_debug_wav(audio_data, sr=SAMPLE_RATE):
+    # opt-in: keeps a copy of what was sent to Whisper for debugging
+    try:
+        folder = Path(DEBUG_WAV_DIR)
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / time.strftime("utterance-%Y%m%d-%H%M%S.wav")
+        return write_wav(path, audio_data, sr)
+    except Exception:
+        logger.exception("Failed to write debug WAV")
+        return None
 
 def strip_wake_word(text):
     text = text.lower()
@@ -109,23 +138,54 @@ def strip_wake_word(text):
 
 
 
-def transcribe_whisper():
-    audio = wait_for_wake_word_audio()
+def transcribe_raw(audio):
+    """Plain transcript of audio, no wake-word handling."""
+    # the float32 buffer goes straight to the model; no temp file, no ffmpeg
+    return get_model().transcribe(audio)
 
-    if audio is None:
+
+def command_from_text(text):
+    """The command in a transcript addressed to Jarvis, or "" if it is not."""
+    if not text or not contains_wake_word(text):
         return ""
+    return strip_wake_word(text)
+
 
-    path = save_temp_wav(audio)
-    result = model.transcribe(path, fp16=False)
-    text = result.get("text", "").strip()
+def wake_word_plausible(audio):
+    # spotter check without touching its counters (used for partial decodes)
+    return not WAKE_WORD_SPOTTER or not spotter.ready or spotter.score(audio) <= spotter.threshold
 
-    if not text:
+
+def transcribe_audio(audio):
+    """Wake-word check + Whisper on one captured utterance; the command text or ""."""
+    # cheap check first: most captured audio is not addressed to Jarvis
+    accepted = not WAKE_WORD_SPOTTER or spotter.detect(audio)
+    if not accepted and not spotter.should_audit():
         return ""
 
-    if not contains_wake_word(text):
+    if DEBUG_WAV_DIR:
+        save_debug_wav(audio)
+
+    text = transcribe_raw(audio)
+    heard = bool(text) and contains_wake_word(text)
+    if WAKE_WORD_SPOTTER and spotter.ready:
+        spotter.record_outcome(accepted, heard)
+
+    if not accepted or not heard:
         return ""
 
     return strip_wake_word(text)
 
 
+def transcribe_whisper(source=None, on_partial=None):
+    if STREAMING:
+        # partial hypotheses + early endpointing; voice_listener imports this module
+        from voice_listener import listen_once
+        return listen_once(source, on_partial)
+
+    audio = wait_for_wake_word_audio(source=source)
+
+    if audio is None:
+        return ""
 
+    return transcribe_audio(audio)
@@ -1,17 +1,72 @@
 #main.py
+import time
+_STARTED = time.perf_counter()
+
 import sys
 import json
-import time
+import importlib
+import threading
 import traceback
-from jarvis_brain import decide
-from jarvis_voice import transcribe_whisper
+from concurrent.futures import ThreadPoolExecutor
 from logger import logger
+import config
+
+# import name -> ms, each module's own cost: dependencies are imported
+# before the modules that use them, so nothing is counted twice. Heavy
+# modules (whisper, pyttsx3, pyautogui) are not imported here at all, they
+# load on first use or in preload_heavy_modules
+STARTUP_TIMINGS = {}
+
+def timed_import(name, optional=False):
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        if not optional:
+            raise
+        module = None
+    STARTUP_TIMINGS[name] = round((time.perf_counter() - started) * 1000, 1)
+    return module
+
+timed_import("numpy", optional=True)
+timed_import("db")
+timed_import("memory_vectors", optional=True)
+timed_import("jarvis_memory")
+timed_import("ollama_client")
+prompt_builder = timed_import("prompt_builder")
+plan_cache = timed_import("plan_cache").plan_cache
+conversations = timed_import("conversation_store").conversations
+timed_import("tools")
+intent_router = timed_import("intent_router")
+timed_import("jarvis_tts")
+jarvis_brain = timed_import("jarvis_brain")
+model_warmer = timed_import("model_warmer")
+memory_retention = timed_import("memory_retention")
+decide = jarvis_brain.decide
+DecisionCancelled = jarvis_brain.DecisionCancelled
+
+STREAM_REPLIES = config.ENGINE.get("stream_replies", False)
+PRELOAD_HEAVY = config.ENGINE.get("preload_heavy_modules", True)
+MAX_WORKERS = config.ENGINE.get("max_workers", 4)
+MAX_PENDING = config.ENGINE.get("max_pending", 16)
+CONTINUOUS_LISTENING = config.VOICE.get("continuous_listening", False)
+
+_send_lock = threading.Lock()
+_voice_lock = threading.Lock()  # one microphone, one recording at a time
+
+# request id -> cancel event for work that has been accepted but not answered
+_inflight = {}
+_inflight_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+_shutdown = threading.Event()
+_listener = None
 
 def send(data):
     try:
         line = json.dumps(data, ensure_ascii=False)
-        sys.stdout.write(line + "\n")
-        sys.stdout.flush()
+        with _send_lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
         logger.debug("Sent to stdout: " + line)
     except Exception:
         logger.exception("Failed to send response")
@@ -22,70 +77,235 @@ def safe_json_load(s):
     except Exception:
         return None
 
-def main_loop():
-    send({"status": "jarvis-ready"})
-    logger.info("Engine started, waiting for input on stdin...")
-    for raw in sys.stdin:
-        raw = raw.strip()
-        if not raw:
-            continue
+def with_id(data, req_id):
+    if req_id is not None:
+        data["id"] = req_id
+    return data
 
-        logger.info("Received raw input: " + raw)
-        # trying JSON first
-        req = safe_json_load(raw)
-        if req is None:
-            # If not json, treating as raw command
-            logger.debug("Input is not JSON, treating as raw command")
-            command_text = raw
-            try:
-                out = decide(command_text)
-                send(out)
-                # handling shutdown
-                if out.get("tool") == "meta" and isinstance(out.get("result"), dict) and out["result"].get("shutdown"):
-                    logger.info("Shutdown requested -> exiting")
-                    break
-            except Exception:
-                logger.exception("Error handling raw command")
-                send({"reply": "[ERROR] internal error", "tool": "none", "result": None})
-            continue
+def delta_sender(enabled, req_id=None):
+    # incremental reply tokens go out as {"type": "delta"} lines before the final result
+    if not enabled:
+        return None
+    return lambda text: send(with_id({"type": "delta", "text": text}, req_id))
+
+def is_shutdown(out):
+    return out.get("tool") == "meta" and isinstance(out.get("result"), dict) and bool(out["result"].get("shutdown"))
+
+def stt_stats():
+    backend = sys.modules["stt_backends"].loaded_backend() if "stt_backends" in sys.modules else None
+    return backend.get_stats() if backend else None
+
+def metrics():
+    with _inflight_lock:
+        inflight = len(_inflight)
+    return {
+        "router": intent_router.get_stats(),
+        "plan_cache": plan_cache.stats(),
+        "prompts": prompt_builder.get_stats(),
+        "conversations": conversations.stats(),
+        "retention": memory_retention.status(),
+        "workers": {"inflight": inflight, "max_workers": MAX_WORKERS, "max_pending": MAX_PENDING},
+        "startup_ms": dict(STARTUP_TIMINGS),
+        # only once voice input has been used; metrics must not load numpy
+        "wake_word": sys.modules["wake_word"].spotter.get_stats() if "wake_word" in sys.modules else None,
+        "listener": _listener.get_stats() if _listener else None,
+        "stt": stt_stats()
+    }
+
+def handle_request(req_id, command, model, stream, cancel_event, session=None):
+    try:
+        if cancel_event.is_set():
+            raise DecisionCancelled("queued")
 
-        # if json, expect {"command": "..."} optionally {"model": "..."}
-        command = req.get("command") or req.get("message") or ""
-        model = req.get("model")
         # trying voice input
         if command == "voice_input":
             try:
-                text = transcribe_whisper()
-
-                if not text:
-                    logger.info("Wake word not detected — ignoring input")
-                    continue
-                
-                out = decide(text)
-                send(out)
-
-                if out.get("tool") == "meta" and isinstance(out.get("result"), dict) and out["result"].get("shutdown"):
-                    logger.info("Shutdown requested -> exiting")
-                    break
+                def on_partial(text):
+                    send(with_id({"type": "partial", "text": text}, req_id))
+
+                with _voice_lock:
+                    text = importlib.import_module("jarvis_voice").transcribe_whisper(on_partial=on_partial)
             except Exception:
                 logger.exception("Voice transcription failed")
-                send({"text": ""})
-            continue
+                send(with_id({"text": ""}, req_id))
+                return
+
+            if not text:
+                logger.info("Wake word not detected — ignoring input")
+                return
+            command = text
+
+        out = decide(
+            command, model=model, on_delta=delta_sender(stream, req_id),
+            cancel_event=cancel_event, session=session
+        )
+        send(with_id(out, req_id))
+
+        # handling shutdown
+        if is_shutdown(out):
+            logger.info("Shutdown requested -> exiting")
+            _shutdown.set()
+    except DecisionCancelled:
+        logger.info(f"Request {req_id} cancelled")
+        send(with_id({"reply": "", "tool": "meta", "result": {"cancelled": True}}, req_id))
+    except Exception:
+        logger.exception("Error processing request")
+        send(with_id({"reply": "[ERROR] internal error", "tool": "none", "result": None}, req_id))
+    finally:
+        with _inflight_lock:
+            _inflight.pop(req_id, None)
+        _pending.release()
+
+def cancel_request(target):
+    with _inflight_lock:
+        event = _inflight.get(target)
+    if event is None:
+        return False
+    event.set()
+    return True
+
+def dispatch(raw, executor):
+    # trying JSON first
+    req = safe_json_load(raw)
+    if not isinstance(req, dict):
+        # If not json, treating as raw command
+        logger.debug("Input is not JSON, treating as raw command")
+        req = {"command": raw}
+
+    # if json, expect {"command": "..."} optionally {"id", "model", "stream", "session"}
+    command = req.get("command") or req.get("message") or ""
+    req_id = req.get("id")
+    model = req.get("model")
+    stream = bool(req.get("stream", STREAM_REPLIES))
+    # separate clients keep separate conversation histories
+    session = req.get("session")
+
+    # answered on the reader thread so they never wait behind busy workers
+    if command == "health":
+        send(with_id({"reply": "OK", "tool": "meta", "result": {"status": "ok", **model_warmer.status()}}, req_id))
+        return
+
+    if command == "metrics":
+        send(with_id({"reply": "OK", "tool": "meta", "result": metrics()}, req_id))
+        return
+
+    if command == "cancel":
+        target = req.get("target", req_id)
+        cancelled = cancel_request(target)
+        send(with_id({"reply": "OK", "tool": "meta", "result": {"cancelled": cancelled, "target": target}}, req_id))
+        return
 
-        if command == "health":
-            send({"reply": "OK", "tool": "meta", "result": {"status": "ok"}})
+    if not _pending.acquire(blocking=False):
+        logger.warning("Worker pool saturated, rejecting request")
+        send(with_id({"reply": "[ERROR] busy", "tool": "none", "result": None}, req_id))
+        return
+
+    cancel_event = threading.Event()
+    with _inflight_lock:
+        duplicate = req_id is not None and req_id in _inflight
+        if req_id is not None and not duplicate:
+            _inflight[req_id] = cancel_event
+    if duplicate:
+        # the running request keeps its id; cancel and its reply must not be ambiguous
+        logger.warning(f"Request id {req_id!r} is already in flight, rejecting")
+        _pending.release()
+        send(with_id({"reply": "[ERROR] duplicate id", "tool": "none", "result": None}, req_id))
+        return
+    try:
+        executor.submit(handle_request, req_id, command, model, stream, cancel_event, session)
+    except RuntimeError:
+        # executor already shut down
+        with _inflight_lock:
+            _inflight.pop(req_id, None)
+        _pending.release()
+
+def read_requests(executor):
+    for raw in sys.stdin:
+        raw = raw.strip()
+        if not raw:
             continue
 
+        logger.info("Received raw input: " + raw)
         try:
-            result = decide(command, model=model)
-            send(result)
-            # handling shutdown
-            if result.get("tool") == "meta" and isinstance(result.get("result"), dict) and result["result"].get("shutdown"):
-                logger.info("Shutdown requested -> exiting")
-                break
+            dispatch(raw, executor)
         except Exception:
-            logger.exception("Error processing request")
-            send({"reply": "[ERROR] internal error", "tool": "none", "result": None})
+            logger.exception("Error dispatching request")
+        if _shutdown.is_set():
+            break
+
+def start_listener(executor):
+    # spoken commands enter through the same dispatch as stdin requests
+    global _listener
+
+    def on_command(text, utterance_id):
+        req_id = f"voice-{utterance_id}"
+        send({"type": "heard", "id": req_id, "text": text})
+        dispatch(json.dumps({"command": text, "id": req_id, "session": "voice"}), executor)
+
+    def on_partial(utterance_id, text):
+        # hypothesis while the user is still talking; the final text follows as "heard"
+        send({"type": "partial", "id": f"voice-{utterance_id}", "text": text})
+
+    try:
+        _listener = importlib.import_module("voice_listener").VoiceListener(on_command, on_partial)
+        _listener.start()
+    except Exception:
+        logger.exception("Continuous listening unavailable")
+        _listener = None
+
+def preload_heavy_modules():
+    # runs after jarvis-ready so the first voice / TTS / typing request is fast
+    # without delaying startup
+    steps = [
+        ("jarvis_tts.pyttsx3", lambda: importlib.import_module("jarvis_tts").preload()),
+        ("tools.pyautogui", lambda: importlib.import_module("tools").get_pyautogui()),
+        ("jarvis_voice", lambda: importlib.import_module("jarvis_voice")),
+        ("jarvis_voice.stt", lambda: importlib.import_module("jarvis_voice").get_model()),
+        ("wake_word.templates", lambda: importlib.import_module("wake_word").spotter.load()),
+    ]
+    for name, load in steps:
+        if _shutdown.is_set():
+            return
+        started = time.perf_counter()
+        try:
+            load()
+        except Exception:
+            logger.exception(f"Background preload of {name} failed")
+            continue
+        STARTUP_TIMINGS[f"preload:{name}"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Preloaded {name} in {STARTUP_TIMINGS[f'preload:{name}']} ms")
+
+def main_loop():
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="jarvis-worker")
+    STARTUP_TIMINGS["ready"] = round((time.perf_counter() - _STARTED) * 1000, 1)
+    send({"status": "jarvis-ready"})
+    logger.info(f"Engine started in {STARTUP_TIMINGS['ready']} ms, waiting for input on stdin...")
+    logger.info("Startup import timings (ms): " + json.dumps(STARTUP_TIMINGS))
+    model_warmer.start()
+    memory_retention.start()
+    if PRELOAD_HEAVY:
+        threading.Thread(target=preload_heavy_modules, name="jarvis-preload", daemon=True).start()
+    if CONTINUOUS_LISTENING:
+        start_listener(executor)
+
+    reader = threading.Thread(target=read_requests, args=(executor,), daemon=True)
+    reader.start()
+    try:
+        while not _shutdown.wait(0.2):
+            if not reader.is_alive():
+                # stdin closed: let accepted work finish
+                executor.shutdown(wait=True)
+                return
+    finally:
+        model_warmer.stop()
+        memory_retention.stop()
+        if _listener is not None:
+            _listener.stop()
+        if _shutdown.is_set() or reader.is_alive():
+            with _inflight_lock:
+                for event in _inflight.values():
+                    event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     try:
@@ -95,4 +315,7 @@ if __name__ == "__main__":
     except Exception:
         logger.exception("Fatal error in main loop")
     finally:
+        # drain queued memory writes before closing the connections
+        importlib.import_module("jarvis_memory").shutdown()
+        importlib.import_module("db").close_all()
         logger.info("Engine exiting")
@@ -0,0 +1,152 @@
+#memory_retention.py
+import threading
+import time
+
+import config
+import db
+import jarvis_memory
+from db import get_conn
+from logger import logger
+
+# Keeps memory.db bounded however long the engine runs: expires memories
+# by type, folds repeated free-text memories, caps the row count and
+# then compacts the file. Runs once shortly after startup and then every
+# COMPACT_INTERVAL seconds on a background thread.
+
+COMPACT_INTERVAL = config.MEMORY.get("compact_interval_s", 6 * 3600)
+COMPACT_DELAY = config.MEMORY.get("compact_delay_s", 60)
+TTL_DAYS = config.MEMORY.get("ttl_days", {})
+MAX_ROWS = config.MEMORY.get("max_rows", 5000)
+CONVERSATION_TTL_DAYS = config.MEMORY.get("conversation_ttl_days", 30)
+# VACUUM rewrites the whole file, so only when enough of it is free pages
+VACUUM_FREE_RATIO = config.MEMORY.get("vacuum_free_ratio", 0.2)
+
+_thread = None
+_stop = threading.Event()
+_lock = threading.Lock()
+_stats_lock = threading.Lock()
+STATS = {"runs": 0, "last_run": None, "last_ms": None, "deleted": 0, "vacuumed": 0}
+
+
+def _expire(conn):
+    deleted = []
+    for mem_type, days in TTL_DAYS.items():
+        if days is None or mem_type == "config":
+            continue
+        deleted += conn.execute(
+            "DELETE FROM memory WHERE type = ? AND created_at < datetime('now', ?) RETURNING id, type",
+            (mem_type, f"-{float(days)} days")
+        ).fetchall()
+    return deleted
+
+
+def _dedupe(conn):
+    # the same words stored twice (case, spacing and punctuation ignored): keep the newest
+    return conn.execute(
+        """
+        DELETE FROM memory WHERE key IS NULL AND id NOT IN (
+            SELECT max(id) FROM memory WHERE key IS NULL GROUP BY type, words_key(value)
+        )
+        RETURNING id, type
+        """
+    ).fetchall()
+
+
+def _cap(conn):
+    # config entries are never evicted; everything else keeps the newest MAX_ROWS
+    if not MAX_ROWS:
+        return []
+    return conn.execute(
+        """
+        DELETE FROM memory WHERE type != 'config' AND id NOT IN (
+            SELECT id FROM memory WHERE type != 'config' ORDER BY created_at DESC, id DESC LIMIT ?
+        )
+        RETURNING id, type
+        """,
+        (MAX_ROWS,)
+    ).fetchall()
+
+
+def _expire_conversation(conn):
+    if not CONVERSATION_TTL_DAYS:
+        return 0
+    cutoff = time.time() - CONVERSATION_TTL_DAYS * 86400
+    return conn.execute("DELETE FROM conversation WHERE created_at < ?", (cutoff,)).rowcount
+
+
+def _maintain():
+    # outside any transaction: VACUUM cannot run inside one
+    vacuumed = False
+    with get_conn() as conn, db.own_writes():
+        if db.HAS_FTS:
+            conn.execute("INSERT INTO memory_fts(memory_fts) VALUES ('optimize')")
+            conn.commit()
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if pages and free / pages >= VACUUM_FREE_RATIO:
+            conn.execute("VACUUM")
+            vacuumed = True
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return vacuumed
+
+
+def compact():
+    """Run one retention + compaction pass. Returns what it removed."""
+    with _lock:
+        started = time.perf_counter()
+        jarvis_memory.flush_writes()
+
+        deleted = []
+        with get_conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            deleted += _expire(conn)
+            deleted += _dedupe(conn)
+            deleted += _cap(conn)
+            conversation = _expire_conversation(conn)
+        jarvis_memory.drop_from_caches([r[0] for r in deleted], any(r[1] == "config" for r in deleted))
+
+        vacuumed = _maintain()
+        ms = round((time.perf_counter() - started) * 1000, 1)
+
+        with _stats_lock:
+            STATS["runs"] += 1
+            STATS["last_run"] = time.time()
+            STATS["last_ms"] = ms
+            STATS["deleted"] += len(deleted)
+            STATS["vacuumed"] += int(vacuumed)
+        logger.info(
+            f"Memory compaction: -{len(deleted)} memories, -{conversation} turns, "
+            f"vacuum={vacuumed} in {ms} ms"
+        )
+        return {"memories": len(deleted), "conversation": conversation, "vacuumed": vacuumed}
+
+
+def _run():
+    if _stop.wait(COMPACT_DELAY):
+        return
+    while True:
+        try:
+            compact()
+        except Exception:
+            logger.exception("Memory compaction failed")
+        if _stop.wait(COMPACT_INTERVAL):
+            return
+
+
+def start():
+    global _thread
+    if _thread is not None or not COMPACT_INTERVAL:
+        return
+    _thread = threading.Thread(target=_run, name="jarvis-retention", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def status():
+    with _stats_lock:
+        return dict(STATS)
@@ -0,0 +1,214 @@
+#memory_vectors.py
+import json
+import re
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+import config
+from db import content_words
+from logger import logger
+
+# Offline semantic index over the memory table. Each memory is embedded
+# into a fixed-size vector and kept in a float32 matrix that lives in a
+# memory-mapped .npy file next to memory.db, so it survives restarts
+# without re-embedding. Lookups are one matrix-vector product.
+
+DIM = config.MEMORY.get("embedding_dim", 512)
+EMBEDDING = config.MEMORY.get("embedding", "hashed")  # or a sentence-transformers model name/path
+INITIAL_CAPACITY = 256
+# bumped when the hashed embedding changes, so stored vectors are rebuilt
+INDEX_VERSION = 2
+
+_WORD = re.compile(r"\w+")
+
+
+def _hashed_embed(text):
+    # word unigrams + character 3/4-grams of each content word, hashed into DIM
+    # buckets with a sign bit; char grams make "editor"/"editors" or
+    # "vscode"/"vs code" land close together
+    vec = np.zeros(DIM, dtype=np.float32)
+    grams = []
+    for word in content_words(text) or _WORD.findall(text.lower()):
+        grams.append("w:" + word)
+        padded = f"<{word}>"
+        for n in (3, 4):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    if not grams:
+        return vec
+
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint32, count=len(grams))
+    buckets = (hashes % DIM).astype(np.intp)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vec, buckets, signs)
+    return vec
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _model_embed(text):
+    # optional: a small local sentence-transformers model instead of hashing
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(EMBEDDING, device="cpu")
+    return _model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+def embed(text):
+    vec = _hashed_embed(text) if EMBEDDING == "hashed" else _model_embed(text)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class VectorIndex:
+    def __init__(self, db_path):
+        base = Path(db_path)
+        self.matrix_path = base.with_suffix(".vec.npy")
+        self.ids_path = base.with_suffix(".vec.ids.npy")
+        self.meta_path = base.with_suffix(".vec.json")
+        self._lock = threading.Lock()
+        self.matrix = None
+        self.ids = None
+        self.count = 0
+        self.dim = None
+        self._rows = {}  # memory id -> matrix row
+
+    # storage
+
+    def _allocate(self, capacity, dim):
+        matrix = np.lib.format.open_memmap(self.matrix_path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        ids = np.lib.format.open_memmap(self.ids_path, mode="w+", dtype=np.int64, shape=(capacity,))
+        return matrix, ids
+
+    def _write_meta(self):
+        self.meta_path.write_text(json.dumps({
+            "embedding": EMBEDDING, "version": INDEX_VERSION, "dim": self.dim, "count": self.count
+        }))
+
+    def _open(self):
+        try:
+            meta = json.loads(self.meta_path.read_text())
+            if meta.get("embedding") != EMBEDDING or meta.get("version") != INDEX_VERSION:
+                return False
+            self.matrix = np.load(self.matrix_path, mmap_mode="r+")
+            self.ids = np.load(self.ids_path, mmap_mode="r+")
+            self.dim = meta["dim"]
+            self.count = meta["count"]
+            if self.matrix.shape[1] != self.dim or self.count > len(self.ids):
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        self._rows = {int(i): r for r, i in enumerate(self.ids[:self.count])}
+        return True
+
+    def _grow(self):
+        capacity = max(INITIAL_CAPACITY, len(self.ids) * 2)
+        old_matrix = np.array(self.matrix[:self.count])
+        old_ids = np.array(self.ids[:self.count])
+        self.matrix, self.ids = None, None
+        self.matrix, self.ids = self._allocate(capacity, self.dim)
+        self.matrix[:self.count] = old_matrix
+        self.ids[:self.count] = old_ids
+
+    # public
+
+    def load(self, rows):
+        """Open the persisted index and reconcile it with rows [(id, value)] from the DB."""
+        with self._lock:
+            if not self._open():
+                logger.info("Building memory vector index")
+                self._reset(rows)
+                return
+
+            wanted = {mem_id: value for mem_id, value in rows}
+            stale = [i for i in self._rows if i not in wanted]
+            missing = [(i, v) for i, v in wanted.items() if i not in self._rows]
+            for mem_id in stale:
+                self._remove_one(mem_id)
+            for mem_id, value in missing:
+                self._add_one(mem_id, value)
+            if stale or missing:
+                logger.info(f"Vector index resynced (+{len(missing)} / -{len(stale)})")
+                self._flush()
+
+    def _reset(self, rows):
+        self.count = 0
+        self._rows = {}
+        self.dim = DIM if EMBEDDING == "hashed" else len(embed("dimension probe"))
+        self.matrix, self.ids = self._allocate(max(INITIAL_CAPACITY, len(rows) * 2), self.dim)
+        for mem_id, value in rows:
+            self._add_one(mem_id, value)
+        self._flush()
+
+    def _add_one(self, mem_id, text):
+        if mem_id in self._rows:
+            self._remove_one(mem_id)
+        if self.count == len(self.ids):
+            self._grow()
+        self.matrix[self.count] = embed(text)
+        self.ids[self.count] = mem_id
+        self._rows[mem_id] = self.count
+        self.count += 1
+
+    def _remove_one(self, mem_id):
+        row = self._rows.pop(mem_id, None)
+        if row is None:
+            return
+        last = self.count - 1
+        if row != last:
+            # move the last row into the hole so the live rows stay contiguous
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = self.ids[last]
+            self._rows[int(self.ids[row])] = row
+        self.count = last
+
+    def _flush(self):
+        self.matrix.flush()
+        self.ids.flush()
+        self._write_meta()
+
+    def add(self, mem_id, text):
+        with self._lock:
+            if self.matrix is None:
+                return
+            self._add_one(mem_id, text)
+            self._flush()
+
+    def remove(self, mem_ids):
+        with self._lock:
+            if self.matrix is None:
+                return
+            for mem_id in mem_ids:
+                self._remove_one(mem_id)
+            self._flush()
+
+    def clear(self):
+        with self._lock:
+            if self.matrix is None:
+                return
+            self.count = 0
+            self._rows = {}
+            self._flush()
+
+    def search(self, text, k=5, min_score=0.0):
+        """Return [(memory id, cosine similarity)] best first."""
+        query = embed(text)
+        with self._lock:
+            if self.matrix is None or self.count == 0:
+                return []
+            scores = self.matrix[:self.count] @ query
+            ids = np.array(self.ids[:self.count])
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,111 @@
+#model_warmer.py
+import threading
+import time
+
+import config
+from logger import logger
+from ollama_client import make_client
+
+# Preloads the configured models when the engine starts and keeps them
+# resident afterwards, so the first command (and the first one after an
+# idle period) does not pay the model load.
+
+DEFAULT_MODEL = config.LLM.get("default_model", "gemma2")
+KEEP_ALIVE_INTERVAL = config.LLM.get("keep_alive_interval_s", 240)
+# loading a model from disk can take far longer than a normal request
+WARMUP_TIMEOUT = config.LLM.get("warmup_timeout_s", 120)
+
+_status_lock = threading.Lock()
+MODEL_STATUS = {}
+_thread = None
+_stop = threading.Event()
+_client = None
+
+
+def models_to_warm():
+    models = [
+        DEFAULT_MODEL,
+        config.LLM.get("planner_model"),
+        config.LLM.get("reply_model"),
+    ]
+    seen = []
+    for m in models:
+        if m and m not in seen:
+            seen.append(m)
+    return seen
+
+
+def _set_status(model, **fields):
+    with _status_lock:
+        MODEL_STATUS.setdefault(model, {"warm": False, "load_ms": None, "last_warm": None, "error": None})
+        MODEL_STATUS[model].update(fields)
+
+
+def _resident(name, running):
+    # /api/ps reports "gemma2:latest" for "gemma2"
+    return any(r == name or r.split(":")[0] == name for r in running if r)
+
+
+def warm_model(model):
+    started = time.perf_counter()
+    try:
+        _client.preload(model)
+    except Exception as e:
+        logger.warning(f"Warm-up failed for {model}: {e}")
+        _set_status(model, warm=False, error=str(e))
+        return False
+
+    load_ms = round((time.perf_counter() - started) * 1000)
+    _set_status(model, warm=True, load_ms=load_ms, last_warm=time.time(), error=None)
+    logger.info(f"Model {model} warm ({load_ms} ms)")
+    return True
+
+
+def refresh():
+    """Re-warm any model that is not resident; preloading also resets its keep_alive."""
+    try:
+        running = _client.running_models()
+    except Exception:
+        running = []
+
+    for model in models_to_warm():
+        if _stop.is_set():
+            return
+        if not _resident(model, running):
+            _set_status(model, warm=False)
+        warm_model(model)
+
+
+def _run():
+    for model in models_to_warm():
+        if _stop.is_set():
+            return
+        warm_model(model)
+
+    while not _stop.wait(KEEP_ALIVE_INTERVAL):
+        refresh()
+
+
+def start():
+    global _thread, _client
+    if not config.LLM.get("use_http", True) or not config.LLM.get("warmup_on_start", True):
+        return
+    if _thread is not None:
+        return
+    _client = make_client(pool_size=1, timeout=WARMUP_TIMEOUT)
+    for model in models_to_warm():
+        _set_status(model, warm=False)
+    _thread = threading.Thread(target=_run, name="jarvis-warmer", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def status():
+    with _status_lock:
+        models = {m: dict(s) for m, s in MODEL_STATUS.items()}
+    # None: the warmer is not running, so nothing will ever report warm
+    warm = all(s["warm"] for s in models.values()) if _thread is not None else None
+    return {"warm": warm, "models": models}
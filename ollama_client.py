@@ -0,0 +1,195 @@
+#ollama_client.py
+import http.client
+import json
+import queue
+import threading
+from urllib.parse import urlsplit
+
+import config
+from logger import logger
+
+# errors that mean "the server is not there / the connection broke",
+# used by callers to decide when to fall back to the CLI
+CONNECTION_ERRORS = (OSError, http.client.HTTPException)
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaClient:
+    """Small client for the Ollama REST API.
+
+    Keeps a fixed pool of kept-alive HTTP connections so consecutive
+    prompts reuse the same socket instead of reconnecting (or forking
+    `ollama run`) every time.
+    """
+
+    def __init__(self, base_url, timeout=30, keep_alive="30m", pool_size=2):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.https else 11434)
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+
+        # None slots are connected lazily on first use
+        self._pool = queue.LifoQueue(maxsize=max(1, pool_size))
+        for _ in range(self._pool.maxsize):
+            self._pool.put(None)
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _open(self, path, payload, method="POST"):
+        """Send a request and return (conn, response). The caller must
+        hand the connection back with _release once the body is read."""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+        conn = self._pool.get()
+        reused = conn is not None
+        try:
+            if conn is None:
+                conn = self._connect()
+            try:
+                conn.request(method, self.base_path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # server closed an idle kept-alive socket, retry once on a fresh one
+                conn.close()
+                conn = self._connect()
+                conn.request(method, self.base_path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+        except Exception:
+            if conn is not None:
+                conn.close()
+            self._pool.put(None)
+            raise
+
+        if resp.status != 200:
+            detail = resp.read().decode("utf-8", errors="replace")
+            self._release(conn, resp)
+            raise OllamaError(f"HTTP {resp.status}: {detail.strip()}")
+
+        return conn, resp
+
+    def _release(self, conn, resp):
+        if resp.will_close or not resp.isclosed():
+            conn.close()
+            conn = None
+        self._pool.put(conn)
+
+    def _call(self, path, payload=None, method="POST"):
+        conn, resp = self._open(path, payload, method)
+        try:
+            data = resp.read()
+        except Exception:
+            conn.close()
+            self._pool.put(None)
+            raise
+        self._release(conn, resp)
+        return json.loads(data.decode("utf-8"))
+
+    def generate(self, prompt, model, options=None):
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+        }
+        if options:
+            payload["options"] = options
+
+        data = self._call("/api/generate", payload)
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data.get("response", "")
+
+    def generate_stream(self, prompt, model, options=None):
+        """Yield response fragments as Ollama produces them."""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+        }
+        if options:
+            payload["options"] = options
+
+        conn, resp = self._open("/api/generate", payload)
+        finished = False
+        try:
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                data = json.loads(line.decode("utf-8"))
+                if "error" in data:
+                    raise OllamaError(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    # drain the chunked terminator so the socket can be reused
+                    resp.read()
+                    finished = True
+                    break
+        finally:
+            if finished:
+                self._release(conn, resp)
+            else:
+                # consumer stopped early or the stream broke
+                conn.close()
+                self._pool.put(None)
+
+    def preload(self, model):
+        """Load the model (empty prompt) and reset its keep_alive timer."""
+        data = self._call("/api/generate", {"model": model, "keep_alive": self.keep_alive})
+        if "error" in data:
+            raise OllamaError(data["error"])
+
+    def running_models(self):
+        data = self._call("/api/ps", method="GET")
+        return [m.get("name") or m.get("model") for m in data.get("models", [])]
+
+    def close(self):
+        conns = []
+        while True:
+            try:
+                conns.append(self._pool.get_nowait())
+            except queue.Empty:
+                break
+        for conn in conns:
+            if conn is not None:
+                conn.close()
+            self._pool.put(None)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def make_client(pool_size=None, timeout=None):
+    return OllamaClient(
+        config.LLM.get("ollama_url", "http://127.0.0.1:11434"),
+        timeout=timeout or config.LLM.get("ollama_timeout_s", 30),
+        keep_alive=config.LLM.get("keep_alive", "30m"),
+        pool_size=pool_size or config.LLM.get("http_pool_size", 2),
+    )
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            return _client
+        _client = make_client()
+        logger.info(f"Ollama HTTP client -> {_client.host}:{_client.port}")
+    return _client
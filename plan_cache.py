@@ -0,0 +1,130 @@
+#plan_cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from db import get_conn
+from logger import logger
+
+# LRU + TTL cache of validated planner output. Entries are written through
+# to the plan_cache table so repeated commands skip the planner call even
+# after a restart.
+
+MAX_ENTRIES = config.LLM.get("plan_cache_size", 256)
+TTL_S = config.LLM.get("plan_cache_ttl_s", 7 * 24 * 3600)
+
+
+def catalog_hash(tool_definitions: str, tool_names):
+    data = tool_definitions + "\n" + ",".join(sorted(tool_names))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(message: str, model: str, catalog: str):
+    normalized = " ".join(message.lower().split()).strip(" .!?")
+    raw = f"{catalog}\n{model}\n{normalized}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_s=TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()  # key -> (plan, created_at)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        # called with the lock held
+        self._loaded = True
+        cutoff = time.time() - self.ttl_s
+        try:
+            with get_conn() as conn:
+                conn.execute("DELETE FROM plan_cache WHERE created_at < ?", (cutoff,))
+                rows = conn.execute(
+                    "SELECT key, plan, created_at FROM plan_cache ORDER BY created_at DESC LIMIT ?",
+                    (self.max_entries,)
+                ).fetchall()
+        except Exception:
+            logger.exception("Failed to load plan cache")
+            return
+
+        for key, plan, created_at in reversed(rows):
+            try:
+                self._entries[key] = (json.loads(plan), created_at)
+            except ValueError:
+                continue
+        logger.info(f"Plan cache loaded {len(self._entries)} entries")
+
+    def get(self, key):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_s:
+                del self._entries[key]
+                self._delete(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, plan):
+        now = time.time()
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries[key] = (plan, now)
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                evicted.append(old_key)
+
+        try:
+            with get_conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO plan_cache (key, plan, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(plan), now)
+                )
+                if evicted:
+                    conn.executemany("DELETE FROM plan_cache WHERE key = ?", [(k,) for k in evicted])
+        except Exception:
+            logger.exception("Failed to persist plan cache entry")
+
+    def _delete(self, key):
+        try:
+            with get_conn() as conn:
+                conn.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+        except Exception:
+            logger.exception("Failed to delete plan cache entry")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._loaded = True
+        try:
+            with get_conn() as conn:
+                conn.execute("DELETE FROM plan_cache")
+        except Exception:
+            logger.exception("Failed to clear plan cache")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "size": len(self._entries),
+            }
+
+
+plan_cache = PlanCache()
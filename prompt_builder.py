@@ -0,0 +1,131 @@
+#prompt_builder.py
+import threading
+
+import config
+from logger import logger
+
+# Prompts are assembled as a static prefix (system prompt, tool catalog,
+# rules) followed by the dynamic parts (context, memory, user message).
+# Keeping the prefix byte-identical between calls lets Ollama reuse its
+# KV cache for it; the dynamic parts are fitted into a token budget.
+
+TOKEN_BUDGET = config.LLM.get("prompt_token_budget", 4096)
+
+_stats_lock = threading.Lock()
+PROMPT_STATS = {}
+
+
+def estimate_tokens(text: str):
+    # ~4 characters per token is close enough for budgeting and avoids
+    # pulling in a tokenizer
+    return (len(text) + 3) // 4
+
+
+class PromptBuilder:
+    def __init__(self, stage: str, budget: int | None = None):
+        self.stage = stage
+        self.budget = budget or TOKEN_BUDGET
+        self.prefix_parts = []
+        self.sections = []
+
+    def static(self, text: str):
+        """Append to the cacheable prefix. Must not depend on the request."""
+        self.prefix_parts.append(text.strip("\n"))
+        return self
+
+    def add(self, title: str, items, priority: int = 0, keep: str = "head", required: bool = False):
+        """Append a dynamic section.
+
+        items is a string or a list of lines. When the budget runs out,
+        sections with the lowest priority are cut first; `keep` says whether
+        the first ("head") or last ("tail") lines survive truncation.
+        Required sections are always included.
+        """
+        if isinstance(items, str):
+            items = [items] if items.strip() else []
+        items = [i for i in items if i]
+        self.sections.append({
+            "title": title,
+            "items": items,
+            "priority": priority,
+            "keep": keep,
+            "required": required,
+        })
+        return self
+
+    def _render(self, section, items):
+        body = "\n".join(items)
+        return f"{section['title']}\n{body}" if section["title"] else body
+
+    def build(self) -> str:
+        prefix = "\n\n".join(self.prefix_parts)
+        prefix_tokens = estimate_tokens(prefix)
+        remaining = self.budget - prefix_tokens
+
+        chosen = [None] * len(self.sections)
+        dropped = 0
+
+        # required sections first, then the rest by priority
+        order = sorted(
+            range(len(self.sections)),
+            key=lambda i: (not self.sections[i]["required"], -self.sections[i]["priority"], i)
+        )
+        for i in order:
+            section = self.sections[i]
+            items = section["items"]
+            if not items:
+                continue
+            if section["required"]:
+                chosen[i] = items
+                remaining -= estimate_tokens(self._render(section, items))
+                continue
+
+            kept = []
+            ordered = items if section["keep"] == "head" else list(reversed(items))
+            used = estimate_tokens(section["title"]) + 1
+            for item in ordered:
+                cost = estimate_tokens(item) + 1
+                if used + cost > remaining:
+                    break
+                kept.append(item)
+                used += cost
+            dropped += len(items) - len(kept)
+            if kept:
+                if section["keep"] == "tail":
+                    kept.reverse()
+                chosen[i] = kept
+                remaining -= used
+
+        parts = [prefix]
+        for section, items in zip(self.sections, chosen):
+            if items:
+                parts.append(self._render(section, items))
+        prompt = "\n\n".join(parts) + "\n"
+
+        total_tokens = estimate_tokens(prompt)
+        self._record(prefix_tokens, total_tokens, dropped)
+        return prompt
+
+    def _record(self, prefix_tokens, total_tokens, dropped):
+        with _stats_lock:
+            stats = PROMPT_STATS.setdefault(self.stage, {
+                "calls": 0,
+                "prefix_tokens": 0,
+                "last_tokens": 0,
+                "max_tokens": 0,
+                "dropped_items": 0,
+            })
+            stats["calls"] += 1
+            stats["prefix_tokens"] = prefix_tokens
+            stats["last_tokens"] = total_tokens
+            stats["max_tokens"] = max(stats["max_tokens"], total_tokens)
+            stats["dropped_items"] += dropped
+        logger.debug(
+            f"Prompt[{self.stage}] ~{total_tokens} tokens "
+            f"(prefix {prefix_tokens}, budget {self.budget}, dropped {dropped})"
+        )
+
+
+def get_stats():
+    with _stats_lock:
+        return {stage: dict(s) for stage, s in PROMPT_STATS.items()}
@@ -0,0 +1,152 @@
+#stt_backends.py
+import threading
+import time
+
+import numpy as np
+
+import config
+from audio_io import SAMPLE_RATE
+from logger import logger
+
+# Speech-to-text engines behind one interface, chosen in config.VOICE:
+#   "whisper"         openai-whisper (PyTorch, fp32 on CPU)
+#   "faster-whisper"  CTranslate2 build of the same models; int8 on CPU is
+#                     several times faster and uses a fraction of the memory
+# Every transcription records its real-time factor (decode time / audio
+# length) so model size and backend can be tuned per machine.
+
+BACKEND = config.VOICE.get("stt_backend", "whisper")
+MODEL_SIZE = config.VOICE.get("stt_model", "small")
+LANGUAGE = config.VOICE.get("stt_language")  # None = auto-detect
+THREADS = config.VOICE.get("stt_threads")  # None = library default
+COMPUTE_TYPE = config.VOICE.get("stt_compute_type", "int8")
+BEAM_SIZE = config.VOICE.get("stt_beam_size", 1)
+
+
+class STTBackend:
+    name = "base"
+
+    def __init__(self, model_size=MODEL_SIZE, language=LANGUAGE, threads=THREADS):
+        self.model_size = model_size
+        self.language = language
+        self.threads = threads
+        self._lock = threading.Lock()  # models are not safe to run concurrently
+        self._stats_lock = threading.Lock()
+        self.stats = {"count": 0, "audio_s": 0.0, "decode_s": 0.0, "last_rtf": None}
+
+    def load(self):
+        raise NotImplementedError
+
+    def _transcribe(self, audio):
+        raise NotImplementedError
+
+    def transcribe(self, audio):
+        """Text for 16 kHz mono float32 audio."""
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        with self._lock:
+            started = time.perf_counter()
+            text = self._transcribe(audio)
+            decode_s = time.perf_counter() - started
+
+        audio_s = len(audio) / SAMPLE_RATE
+        rtf = decode_s / audio_s if audio_s else None
+        with self._stats_lock:
+            self.stats["count"] += 1
+            self.stats["audio_s"] += audio_s
+            self.stats["decode_s"] += decode_s
+            self.stats["last_rtf"] = round(rtf, 3) if rtf is not None else None
+        logger.debug(f"STT {self.name}/{self.model_size}: {audio_s:.1f}s audio in {decode_s:.2f}s (RTF {rtf or 0:.2f})")
+        return text.strip()
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["rtf"] = round(stats["decode_s"] / stats["audio_s"], 3) if stats["audio_s"] else None
+        stats["audio_s"] = round(stats["audio_s"], 1)
+        stats["decode_s"] = round(stats["decode_s"], 2)
+        return {"backend": self.name, "model": self.model_size, **stats}
+
+
+class WhisperBackend(STTBackend):
+    name = "whisper"
+
+    def load(self):
+        # whisper (and torch under it) is imported here, not at module import
+        import whisper
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        self.model = whisper.load_model(self.model_size, device="cpu")
+        return self
+
+    def _transcribe(self, audio):
+        result = self.model.transcribe(
+            audio, fp16=False, language=self.language,
+            beam_size=BEAM_SIZE if BEAM_SIZE and BEAM_SIZE > 1 else None
+        )
+        return result.get("text", "")
+
+
+class FasterWhisperBackend(STTBackend):
+    name = "faster-whisper"
+
+    def __init__(self, compute_type=COMPUTE_TYPE, **kwargs):
+        super().__init__(**kwargs)
+        self.compute_type = compute_type
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(
+            self.model_size,
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=self.threads or 0
+        )
+        return self
+
+    def _transcribe(self, audio):
+        segments, _ = self.model.transcribe(audio, language=self.language, beam_size=BEAM_SIZE or 1)
+        # segments is a generator; decoding happens while it is consumed
+        return "".join(segment.text for segment in segments)
+
+    def get_stats(self):
+        return {**super().get_stats(), "compute_type": self.compute_type}
+
+
+BACKENDS = {
+    "whisper": WhisperBackend,
+    "faster-whisper": FasterWhisperBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name=BACKEND):
+    started = time.perf_counter()
+    cls = BACKENDS.get(name)
+    if cls is None:
+        logger.warning(f"Unknown STT backend '{name}', using whisper")
+        name, cls = "whisper", WhisperBackend
+    try:
+        backend = cls().load()
+    except ImportError:
+        if name == "whisper":
+            raise
+        logger.warning(f"STT backend '{name}' is not installed, falling back to whisper")
+        backend = WhisperBackend().load()
+    logger.info(f"STT {backend.name} '{backend.model_size}' loaded in {time.perf_counter() - started:.1f}s")
+    return backend
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+    return _backend
+
+
+def loaded_backend():
+    # for metrics: never triggers a model load
+    return _backend
@@ -0,0 +1,30 @@
+#conftest.py
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# the engine modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+# keep imports that touch the database (jarvis_memory runs init_db) away
+# from the real memory.db
+db.DB_PATH = Path(tempfile.mkdtemp(prefix="jarvis-test-")) / "memory.db"
+
+
+@pytest.fixture
+def memory_db(tmp_path, monkeypatch):
+    """A fresh memory.db for one test, with the memory caches reset."""
+    import jarvis_memory
+
+    jarvis_memory.flush_writes()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "memory.db")
+    db.init_db()
+    monkeypatch.setattr(jarvis_memory, "_vector_index", None)
+    monkeypatch.setattr(jarvis_memory, "_config_cache", None)
+    monkeypatch.setattr(jarvis_memory, "_config_version", None)
+    yield db.DB_PATH
+    jarvis_memory.flush_writes()
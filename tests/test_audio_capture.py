@@ -0,0 +1,68 @@
+#test_audio_capture.py
+import numpy as np
+
+import jarvis_voice
+from audio_capture import RingBuffer, SyntheticSource, UtteranceSegmenter, benchmark
+from vad import AdaptiveVAD
+
+
+def test_ring_reads_across_the_wrap_are_contiguous():
+    ring = RingBuffer(10)
+    for start in range(0, 26, 4):
+        ring.write(np.arange(start, start + 4, dtype=np.float32))
+    assert ring.written == 28
+    assert ring.latest(10).tolist() == list(range(18, 28))
+    assert ring.view(20, 25).tolist() == list(range(20, 25))
+
+
+def test_overrun_is_counted_and_only_the_newest_samples_are_kept():
+    ring = RingBuffer(10)
+    ring.write(np.arange(3, dtype=np.float32))
+    ring.write(np.arange(3, 28, dtype=np.float32))  # one block larger than the ring
+    assert ring.written == 28
+    assert ring.latest(10).tolist() == list(range(18, 28))
+    # samples that were overwritten are clamped off, not returned stale
+    assert ring.view(0, 28).tolist() == list(range(18, 28))
+    assert len(ring.view(5, 15)) == 0
+
+
+def test_benchmark_sees_every_block():
+    source = SyntheticSource(duration=3.0, realtime=False)
+    report = benchmark(source)
+    assert report["samples"] == 3 * source.sample_rate
+    assert report["blocks"] == 30
+
+
+def test_segmenter_finds_each_burst():
+    source = SyntheticSource(duration=8.0, bursts=((1.0, 1.0), (4.0, 1.5)), realtime=False)
+    seg = UtteranceSegmenter(AdaptiveVAD(hangover_s=0.5), sample_rate=source.sample_rate)
+    spans = []
+    source.start(lambda block: spans.extend(seg.feed(block)))
+    source.finished.wait(5)
+    source.stop()
+
+    sr = source.sample_rate
+    assert len(spans) == 2
+    for (start, end), (burst, length) in zip(spans, ((1.0, 1.0), (4.0, 1.5))):
+        assert start / sr <= burst and end / sr >= burst + length - 0.2
+        assert len(seg.audio((start, end))) == end - start
+
+
+def test_segmenter_cuts_speech_longer_than_the_maximum():
+    source = SyntheticSource(duration=9.0, bursts=((0.5, 8.0),), realtime=False)
+    seg = UtteranceSegmenter(AdaptiveVAD(hangover_s=0.5), sample_rate=source.sample_rate, max_utterance_s=3)
+    spans = []
+    source.start(lambda block: spans.extend(seg.feed(block)))
+    source.finished.wait(5)
+    source.stop()
+
+    assert len(spans) >= 3
+    # max length plus the lead-in, to block granularity
+    longest = (3 + 0.3) * source.sample_rate + source.blocksize
+    assert all(end - start <= longest for start, end in spans)
+
+
+def test_recording_keeps_an_utterance_in_progress_at_the_timeout():
+    source = SyntheticSource(duration=3.0, bursts=((0.3, 1.5),))
+    audio = jarvis_voice.record_audio_silence(source, timeout=0.6)
+    assert audio is not None and len(audio) >= 1.5 * source.sample_rate
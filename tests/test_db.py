@@ -0,0 +1,19 @@
+#test_db.py
+import sqlite3
+
+import pytest
+
+import db
+
+
+def test_exhausted_pool_raises_instead_of_hanging(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "BUSY_TIMEOUT_MS", 100)
+    pool = db.ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    with pool.connection():
+        with pytest.raises(sqlite3.OperationalError, match="no free database connection"):
+            with pool.connection():
+                pass
+    # the connection went back once released
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    pool.close()
@@ -0,0 +1,41 @@
+#test_intent_router.py
+import pytest
+
+import intent_router
+
+
+def tools(message):
+    plan = intent_router.route(message)
+    return None if plan is None else [(a["tool"], a["args"]) for a in plan["actions"]]
+
+
+@pytest.mark.parametrize("message", [
+    "search for report.pdf in downloads",
+    "look up my tax documents",
+    "search for the budget file",
+    "search for photos in my pictures",
+])
+def test_file_searches_go_to_the_planner(message):
+    assert intent_router.route(message) is None
+
+
+@pytest.mark.parametrize("message, query", [
+    ("search for python tutorials", "python tutorials"),
+    ("Jarvis, look up restaurants in berlin", "restaurants in berlin"),
+    ("google example.com", "example.com"),
+])
+def test_web_searches_use_the_fast_path(message, query):
+    assert tools(message) == [("google_search", {"query": query})]
+
+
+def test_write_requests_go_to_the_planner():
+    assert intent_router.route("write a poem about cats") is None
+
+
+@pytest.mark.parametrize("message, text", [
+    ("type hello world.", "hello world."),
+    ("type I love you please", "I love you please"),
+    ("Jarvis, type out  a, b and c!", "a, b and c!"),
+])
+def test_type_keeps_the_text_as_said(message, text):
+    assert tools(message) == [("type_text", {"text": text})]
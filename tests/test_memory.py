@@ -0,0 +1,92 @@
+#test_memory.py
+import sqlite3
+
+import jarvis_memory
+import memory_retention
+from plan_cache import PlanCache
+
+
+def count_config_loads(monkeypatch):
+    loads = []
+    load = jarvis_memory._load_config
+    monkeypatch.setattr(jarvis_memory, "_load_config", lambda: loads.append(1) or load())
+    return loads
+
+
+def test_own_writes_keep_config_cache(memory_db, monkeypatch):
+    loads = count_config_loads(monkeypatch)
+    jarvis_memory.set_config("mode", "casual")
+    assert jarvis_memory.get_config("mode") == "casual"
+
+    PlanCache().put("key", [{"tool": "open_app", "args": {"app_name": "chrome"}}])
+    jarvis_memory.add_conversation_turn("s", "User", "hello")
+    jarvis_memory.add_memory("note", "buy milk")
+    jarvis_memory.flush_writes()
+    memory_retention.compact()
+
+    assert jarvis_memory.get_config("mode") == "casual"
+    assert len(loads) == 1
+
+
+def test_other_process_write_reloads_config(memory_db, monkeypatch):
+    loads = count_config_loads(monkeypatch)
+    jarvis_memory.set_config("mode", "casual")
+    assert jarvis_memory.get_config("mode") == "casual"
+
+    with sqlite3.connect(memory_db) as conn:
+        conn.execute("UPDATE memory SET value = 'developer' WHERE key = 'mode'")
+
+    assert jarvis_memory.get_config("mode") == "developer"
+    assert len(loads) == 2
+
+
+def memory_values():
+    return sorted(value for _, _, value, _ in jarvis_memory.get_all_memory())
+
+
+def test_same_words_fold_into_one_memory(memory_db):
+    jarvis_memory.add_memory("note", "My sister is Anna.")
+    jarvis_memory.add_memory("note", "my sister is anna")
+    assert memory_values() == ["my sister is anna"]
+
+
+def test_similar_but_different_memories_are_kept(memory_db):
+    for value in (
+        "alice phone number is 5551234",
+        "bob phone number is 5551234",
+        "i do like spicy food",
+        "i do not like spicy food",
+    ):
+        jarvis_memory.add_memory("note", value)
+    assert len(memory_values()) == 4
+
+
+def test_compaction_folds_repeats_stored_before(memory_db):
+    # rows written directly, as by an older version without the write-time check
+    with jarvis_memory.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO memory (type, value) VALUES ('note', ?)",
+            [("My sister is Anna.",), ("my  sister is anna",), ("my sister is not anna",)]
+        )
+    assert memory_retention.compact()["memories"] == 1
+    assert memory_values() == ["my  sister is anna", "my sister is not anna"]
+
+
+def test_recall_returns_only_relevant_memories(memory_db):
+    for value in ("my sister is anna", "my favourite editor is vs code", "my job is software engineer",
+                  "i live in berlin", "my dog is called rex"):
+        jarvis_memory.add_memory("note", value)
+    jarvis_memory.add_memory("fact", "Tony", key="name")
+
+    assert jarvis_memory.recall("what's my job") == ["Tony", "my job is software engineer"]
+    assert jarvis_memory.recall("what is the weather") == ["Tony"]
+
+
+def test_name_does_not_take_a_recall_slot(memory_db):
+    for value in ("berlin office on main street", "berlin flat has a balcony", "berlin gym opens at six"):
+        jarvis_memory.add_memory("note", value)
+    jarvis_memory.add_memory("fact", "Tony", key="name")
+
+    recalled = jarvis_memory.recall("berlin", limit=3)
+    assert recalled[0] == "Tony"
+    assert len(recalled) == 4
@@ -0,0 +1,108 @@
+#test_ollama_client.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ollama_client import OllamaClient, OllamaError
+
+TOKENS = ["Hello", " sir.", " All", " done."]
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Just enough of /api/generate: JSON replies and chunked NDJSON streams."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def do_POST(self):
+        self.server.peers.append(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body.get("model") == "missing":
+            out = json.dumps({"error": "model 'missing' not found"}).encode()
+            self.send_response(404)
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+            return
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token in TOKENS:
+                    self._chunk((json.dumps({"response": token, "done": False}) + "\n").encode())
+                    self.wfile.flush()
+                self._chunk((json.dumps({"response": "", "done": True}) + "\n").encode())
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client stopped reading
+            return
+
+        out = json.dumps({"response": f"echo:{body.get('prompt')}", "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    srv.daemon_threads = True
+    srv.peers = []  # client (host, port) of every request
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def make(server, pool_size=1):
+    return OllamaClient(f"http://127.0.0.1:{server.server_port}", timeout=5, pool_size=pool_size)
+
+
+def test_pooled_connection_is_reused(server):
+    client = make(server)
+    replies = [client.generate(f"p{i}", "m") for i in range(5)]
+    assert replies == [f"echo:p{i}" for i in range(5)]
+    assert len(set(server.peers)) == 1
+    client.close()
+
+
+def test_stream_yields_fragments_and_keeps_connection(server):
+    client = make(server)
+    assert list(client.generate_stream("x", "m")) == TOKENS
+    # a fully read stream hands its socket back for the next request
+    assert client.generate("after", "m") == "echo:after"
+    assert len(set(server.peers)) == 1
+    client.close()
+
+
+def test_early_close_releases_connection(server):
+    client = make(server)
+    stream = client.generate_stream("x", "m")
+    assert next(stream) == TOKENS[0]
+    stream.close()
+
+    # the half-read socket is dropped but its pool slot is free again
+    assert client._pool.qsize() == 1
+    assert client.generate("after", "m") == "echo:after"
+    assert len(set(server.peers)) == 2
+    client.close()
+
+
+def test_http_error_raises_and_keeps_pool_usable(server):
+    client = make(server)
+    with pytest.raises(OllamaError, match="404"):
+        client.generate("x", "missing")
+    assert client.generate("again", "m") == "echo:again"
+    client.close()
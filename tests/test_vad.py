@@ -0,0 +1,48 @@
+#test_vad.py
+import numpy as np
+import pytest
+
+import vad
+from audio_capture import SyntheticSource
+from audio_io import SAMPLE_RATE
+
+
+@pytest.fixture(scope="module")
+def fixtures(tmp_path_factory):
+    root = vad.make_fixtures(tmp_path_factory.mktemp("vad"))
+    return sorted(root.glob("speech/*.wav")), sorted(root.glob("noise/*.wav"))
+
+
+def test_adaptive_has_fewer_false_starts_on_hum_and_clicks(fixtures):
+    _, noise = fixtures
+    hum = [p for p in noise if p.name == "hum_clicks.wav"]
+    report = vad.evaluate([], hum)
+    assert report["adaptive"]["false_triggers"] < report["fixed"]["false_triggers"]
+    assert report["adaptive"]["false_triggers"] == 0
+
+
+def test_adaptive_still_detects_all_speech(fixtures):
+    speech, noise = fixtures
+    report = vad.evaluate(speech, noise)
+    assert report["adaptive"]["speech_detected"] == f"{len(speech)}/{len(speech)}"
+    assert report["adaptive"]["false_triggers"] < report["fixed"]["false_triggers"]
+
+
+def test_replay_segments_match_the_bursts():
+    bursts = ((1.0, 1.0), (4.0, 1.5))
+    audio = SyntheticSource(duration=8.0, bursts=bursts, noise=0.01, level=0.25).audio
+    segments = vad.replay(vad.AdaptiveVAD(hangover_s=0.5), audio)
+    assert len(segments) == len(bursts)
+    for (start, end), (burst, length) in zip(segments, bursts):
+        assert burst - 0.2 <= start <= burst + 0.3
+        assert burst + length - 0.2 <= end <= burst + length + 1.0
+
+
+def test_noise_floor_follows_a_louder_room():
+    rng = np.random.default_rng(0)
+    quiet = (0.002 * rng.standard_normal(5 * SAMPLE_RATE)).astype(np.float32)
+    loud = (0.03 * rng.standard_normal(20 * SAMPLE_RATE)).astype(np.float32)
+    segments = vad.replay(vad.AdaptiveVAD(hangover_s=1.2), np.concatenate([quiet, loud]))
+    # the step up may look like speech once, but not for the rest of the stream
+    assert len(segments) <= 1
+    assert all(end < 5 + vad.FLOOR_WINDOW_S + 1.2 + 0.5 for _, end in segments)
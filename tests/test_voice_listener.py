@@ -0,0 +1,107 @@
+#test_voice_listener.py
+import threading
+
+import pytest
+
+import jarvis_voice
+import voice_listener
+from audio_capture import SyntheticSource
+from voice_listener import VoiceListener
+
+
+class FakeSTT:
+    """Stands in for the Whisper model: a fixed transcript, optional failures."""
+
+    def __init__(self, text="jarvis open notepad", fail=0):
+        self.text = text
+        self.fail = fail
+        self.calls = 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        if self.calls <= self.fail:
+            raise RuntimeError("decoder crashed")
+        return self.text
+
+
+@pytest.fixture
+def stt(monkeypatch):
+    fake = FakeSTT()
+    monkeypatch.setattr(jarvis_voice, "get_model", lambda: fake)
+    monkeypatch.setattr(voice_listener, "PARTIAL_INTERVAL", 0.2)
+    return fake
+
+
+def run(listener, seconds):
+    listener.start()
+    try:
+        listener.source.finished.wait(seconds)
+    finally:
+        listener.stop()
+
+
+def test_stable_partials_endpoint_early(stt):
+    commands, partials = [], []
+    source = SyntheticSource(duration=4.0, bursts=((0.5, 1.5),))
+    listener = VoiceListener(lambda text, uid: commands.append((text, uid)),
+                             lambda uid, text: partials.append(text), source=source)
+    run(listener, 6)
+
+    stats = listener.get_stats()
+    assert commands == [("open notepad", 1)]
+    assert partials and set(partials) == {"open notepad"}
+    assert stats["early_endpoints"] == 1
+    assert stats["dropped"] == 0 and stats["errors"] == 0
+
+
+def test_failed_partial_decode_does_not_stop_partials(stt):
+    stt.fail = 1
+    commands = []
+    source = SyntheticSource(duration=4.0, bursts=((0.5, 1.5),))
+    listener = VoiceListener(lambda text, uid: commands.append(text), source=source)
+    run(listener, 6)
+
+    assert listener.get_stats()["errors"] == 1
+    assert commands == ["open notepad"]
+    assert listener.get_stats()["early_endpoints"] == 1
+
+
+def test_full_queue_drops_oldest_utterance(stt, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(stt, "transcribe", lambda audio: release.wait(5) and stt.text)
+
+    commands = []
+    bursts = tuple((0.3 + 1.6 * i, 0.4) for i in range(4))
+    source = SyntheticSource(duration=7.0, bursts=bursts)
+    listener = VoiceListener(lambda text, uid: commands.append(uid), source=source,
+                             queue_size=1, streaming=False)
+    listener.start()
+    try:
+        source.finished.wait(9)
+    finally:
+        release.set()
+        listener.stop()
+
+    stats = listener.get_stats()
+    assert stats["utterances"] == 4
+    assert stats["dropped"] >= 1
+    assert stats["dropped"] + len(commands) <= 4
+
+
+def test_voice_input_streams_partials(stt):
+    partials = []
+    source = SyntheticSource(duration=4.0, bursts=((0.5, 1.5),))
+    assert jarvis_voice.transcribe_whisper(source, on_partial=partials.append) == "open notepad"
+    assert partials and set(partials) == {"open notepad"}
+
+
+def test_voice_input_without_speech_times_out(stt):
+    source = SyntheticSource(duration=30.0, bursts=())
+    assert voice_listener.listen_once(source, timeout=0.5) == ""
+    assert stt.calls == 0
+
+
+def test_voice_input_ignores_speech_not_for_jarvis(stt):
+    stt.text = "what time is it"
+    source = SyntheticSource(duration=4.0, bursts=((0.5, 1.5),))
+    assert jarvis_voice.transcribe_whisper(source) == ""
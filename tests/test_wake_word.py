@@ -0,0 +1,75 @@
+#test_wake_word.py
+import numpy as np
+import pytest
+
+from audio_io import SAMPLE_RATE, write_wav
+from wake_word import WakeWordSpotter, evaluate
+
+
+def sweep(freqs, duration=0.6):
+    """A pitch glide through freqs: a stand-in for one spoken word."""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(np.interp(t, np.linspace(0, duration, len(freqs)), freqs)) / SAMPLE_RATE
+    return (0.3 * np.sin(phase) * np.hanning(len(t))).astype(np.float32)
+
+
+def utterance(word, lead=0.2, seed=0):
+    audio = (0.003 * np.random.default_rng(seed).standard_normal(int(1.5 * SAMPLE_RATE))).astype(np.float32)
+    start = int(lead * SAMPLE_RATE)
+    audio[start:start + len(word)] += word
+    return audio
+
+
+WAKE = (300, 900, 500)
+
+
+@pytest.fixture
+def spotter(tmp_path):
+    write_wav(tmp_path / "jarvis.wav", utterance(sweep(WAKE), lead=0.05)[:int(0.8 * SAMPLE_RATE)])
+    return WakeWordSpotter(templates_dir=tmp_path, threshold=0.2, audit_rate=0.0)
+
+
+def test_template_match_is_accepted(spotter):
+    # same word, slightly off pitch and later in the utterance
+    assert spotter.detect(utterance(sweep(WAKE), seed=1))
+    assert spotter.detect(utterance(sweep((320, 880, 520)), lead=0.4, seed=2))
+    assert spotter.get_stats()["accepted"] == 2
+
+
+def test_other_sounds_are_rejected(spotter):
+    assert not spotter.detect(utterance(sweep((1500, 400, 1200)), seed=3))
+    assert not spotter.detect(utterance(sweep((200, 200)), seed=4))
+    assert not spotter.detect(utterance(np.zeros(1, np.float32), seed=5))
+    assert spotter.get_stats()["rejected"] == 3
+
+
+def test_without_templates_everything_passes(tmp_path):
+    empty = WakeWordSpotter(templates_dir=tmp_path / "missing")
+    assert not empty.ready
+    assert empty.detect(utterance(sweep((1500, 400, 1200))))
+
+
+def test_outcomes_count_false_accepts_and_rejects(spotter):
+    spotter.record_outcome(True, False)
+    spotter.record_outcome(False, True)
+    spotter.record_outcome(False, False)
+    stats = spotter.get_stats()
+    assert (stats["false_accepts"], stats["audited"], stats["false_rejects"]) == (1, 2, 1)
+
+
+def test_evaluate_reports_rates_and_a_separating_threshold(spotter, tmp_path):
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    positives, negatives = [], []
+    for i, freqs in enumerate((WAKE, (320, 880, 520), (290, 920, 480))):
+        positives.append(fixtures / f"pos_{i}.wav")
+        write_wav(positives[-1], utterance(sweep(freqs), lead=0.1 + 0.1 * i, seed=10 + i))
+    for i, freqs in enumerate(((1500, 400, 1200), (200, 200), (900, 300))):
+        negatives.append(fixtures / f"neg_{i}.wav")
+        write_wav(negatives[-1], utterance(sweep(freqs), seed=20 + i))
+
+    report = evaluate(spotter, positives, negatives)
+    assert (report["false_rejects"], report["false_accepts"]) == (0, 0)
+    suggested = WakeWordSpotter(templates_dir=tmp_path, threshold=report["suggested_threshold"])
+    rerun = evaluate(suggested, positives, negatives)
+    assert (rerun["frr"], rerun["far"]) == (0.0, 0.0)
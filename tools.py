@@ -8,43 +8,57 @@ import ctypes
 import pyperclip
 import threading
 
-try:
-    import pyautogui
-    _HAS_PYAUTOGUI = True
-except Exception:
-    _HAS_PYAUTOGUI = False
-    logger.warning("pyautogui not available — type_text tool will be disabled")
+_pyautogui = None
+_HAS_PYAUTOGUI = None  # unknown until first use
+
+
+def get_pyautogui():
+    # pyautogui is slow to import, so it is loaded on first use (or by the
+    # background preload in main.py)
+    global _pyautogui, _HAS_PYAUTOGUI
+    if _HAS_PYAUTOGUI is None:
+        try:
+            import pyautogui
+            _pyautogui = pyautogui
+            _HAS_PYAUTOGUI = True
+        except Exception:
+            _HAS_PYAUTOGUI = False
+            logger.warning("pyautogui not available — type_text tool will be disabled")
+    return _pyautogui
+
+APP_ALIASES = {
+    "file explorer": "explorer",
+    "cmd": "command prompt",
+    "ms edge": "edge",
+    "microsoft edge": "edge",
+    "vs code": "code",
+    "vscode": "code",
+    "visual studio code": "code",
+}
+
+APP_PATHS = {
+    "notepad": "notepad.exe",
+    "calculator": "calc.exe",
+    "explorer": "explorer.exe",
+    "task manager": "taskmgr.exe",
+    "paint": "mspaint.exe",
+    "command prompt": "cmd.exe",
+
+    "edge": r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
+    "chrome": r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+
+    "steam": r"C:\Program Files (x86)\Steam\steam.exe",
+    "epic games": r"C:\Program Files (x86)\Epic Games\Launcher\Engine\Binaries\Win64\EpicGamesLauncher.exe",
+}
 
 def open_app(app_name: str):
     try:
         name = app_name.lower().strip()
 
-        aliases = {
-            "file explorer": "explorer",
-            "cmd": "command prompt",
-            "ms edge": "edge",
-            "microsoft edge": "edge",
-        }
+        if name in APP_ALIASES:
+            name = APP_ALIASES[name]
 
-        if name in aliases:
-            name = aliases[name]
-
-        app_paths = {
-            "notepad": "notepad.exe",
-            "calculator": "calc.exe",
-            "explorer": "explorer.exe",
-            "task manager": "taskmgr.exe",
-            "paint": "mspaint.exe",
-            "command prompt": "cmd.exe",
-
-            "edge": r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
-            "chrome": r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-
-            "steam": r"C:\Program Files (x86)\Steam\steam.exe",
-            "epic games": r"C:\Program Files (x86)\Epic Games\Launcher\Engine\Binaries\Win64\EpicGamesLauncher.exe",
-        }
-
-        path = app_paths.get(name)
+        path = APP_PATHS.get(name)
 
         if path:
             path = os.path.expandvars(path)
@@ -60,19 +74,19 @@ def open_app(app_name: str):
         return {"status": "error", "message": str(e)}
 
 
+WEB_BASE_URLS = {
+    "youtube": "https://www.youtube.com",
+    "spotify": "https://open.spotify.com",
+    "google": "https://www.google.com",
+    "github": "https://github.com",
+    "instagram": "https://www.instagram.com",
+}
+
 def open_web(website: str, query: str | None = None):
     try:
         website = website.lower().strip()
 
-        base_urls = {
-            "youtube": "https://www.youtube.com",
-            "spotify": "https://open.spotify.com",
-            "google": "https://www.google.com",
-            "github": "https://github.com",
-            "instagram": "https://www.instagram.com",
-        }
-
-        base = base_urls.get(website)
+        base = WEB_BASE_URLS.get(website)
 
         if not base:
             webbrowser.open(f"https://www.google.com/search?q={website}")
@@ -107,7 +121,8 @@ def google_search(query: str):
         return {"status": "error", "message": str(e)}
 
 def type_text(text: str):
-    if not _HAS_PYAUTOGUI:
+    pyautogui = get_pyautogui()
+    if pyautogui is None:
         logger.error("type_text requested but pyautogui not installed")
         return {"status": "error", "message": "pyautogui not installed"}
     try:
@@ -188,6 +203,6 @@ def reminder(seconds: int, message: str):
     return {"status": "ok", "message": "Reminder set"}
 
 def set_mode(mode: str):
-    from jarvis_memory import add_memory
-    add_memory("config", mode, key="mode")
+    from jarvis_memory import set_config
+    set_config("mode", mode)
     return {"status": "ok", "message": f"Mode set to {mode}"}
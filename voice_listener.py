@@ -0,0 +1,266 @@
+#voice_listener.py
+import itertools
+import queue
+import threading
+import time
+
+import numpy as np
+
+import config
+import jarvis_voice
+from audio_capture import MicSource
+from logger import logger
+
+# Always-on voice input. The capture side runs on the audio callback and
+# never waits: it segments the stream into utterances and queues a copy of
+# each one. A single transcription worker drains the queue (wake word +
+# Whisper) and hands commands to the engine, so the next utterance is
+# captured while the previous one is being decoded. When the worker falls
+# behind, the oldest queued utterance is dropped and counted.
+#
+# With streaming on, the worker also decodes the utterance so far every
+# PARTIAL_INTERVAL while the user is still talking and reports partial
+# hypotheses. Once the user pauses for EARLY_ENDPOINT and the last two
+# hypotheses agree and cover all the speech, that text is committed right
+# away instead of waiting out the VAD hangover and decoding again.
+# listen_once runs the same path for a single voice_input request.
+
+QUEUE_SIZE = config.VOICE.get("listen_queue_size", 4)
+STREAMING = config.VOICE.get("streaming_partials", True)
+PARTIAL_INTERVAL = config.VOICE.get("partial_interval_s", 0.8)
+PARTIAL_WINDOW = config.VOICE.get("partial_window_s", 10.0)
+EARLY_ENDPOINT = config.VOICE.get("early_endpoint_s", 0.4)
+MIN_PARTIAL_AUDIO = 0.5
+
+
+class Utterance:
+    def __init__(self, utterance_id):
+        self.id = utterance_id
+        self.partial_at = 0.0
+        self.partial_pending = False
+        self.hypotheses = []  # (text, end sample) of each partial decode
+        self.plausible = None  # wake-word spotter verdict, checked once
+        self.done = False
+
+
+def _same(a, b):
+    return " ".join(a.lower().split()).strip(" .,!?") == " ".join(b.lower().split()).strip(" .,!?")
+
+
+class VoiceListener:
+    def __init__(self, on_command, on_partial=None, source=None, queue_size=QUEUE_SIZE, streaming=STREAMING):
+        """on_command(text, utterance_id); on_partial(utterance_id, text) for streaming hypotheses."""
+        self.on_command = on_command
+        self.on_partial = on_partial
+        self.source = source
+        self.streaming = streaming
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._partial = None  # latest partial job; newer ones replace it
+        self._stop = threading.Event()
+        self._worker = None
+        self._segmenter = None
+        self._current = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.utterance_done = threading.Event()  # set after each final transcription
+        self.stats = {
+            "utterances": 0, "dropped": 0, "transcribed": 0, "commands": 0, "errors": 0,
+            "partials": 0, "early_endpoints": 0, "transcribe_s": 0.0, "last_commit_latency_s": None,
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # capture side (audio callback thread)
+
+    def _enqueue(self, item):
+        self._count("utterances")
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                # backpressure: keep the freshest speech, drop the oldest
+                try:
+                    self._queue.get_nowait()
+                    self._count("dropped")
+                except queue.Empty:
+                    pass
+
+    def _finish(self, span, text=None):
+        utterance = self._current or Utterance(next(self._ids))
+        self._current = None
+        utterance.done = True
+        audio = None if text is not None else np.array(self._segmenter.audio(span))
+        self._enqueue((utterance, time.monotonic(), audio, text))
+
+    def _stream_step(self):
+        seg = self._segmenter
+        if self._current is None:
+            self._current = Utterance(next(self._ids))
+        utterance = self._current
+
+        silence = seg.trailing_silence()
+        with self._lock:
+            hyps = utterance.hypotheses[-2:]
+        speech_end = seg.ring.written - silence
+        if (silence >= EARLY_ENDPOINT * seg.sample_rate and len(hyps) == 2
+                and _same(hyps[0][0], hyps[1][0]) and hyps[1][1] >= speech_end):
+            span = seg.end_now()
+            self._count("early_endpoints")
+            self._finish(span, text=hyps[1][0])
+            return
+
+        now = time.monotonic()
+        start, end = seg.current()
+        if (utterance.partial_pending or utterance.plausible is False
+                or now - utterance.partial_at < PARTIAL_INTERVAL
+                or end - start < MIN_PARTIAL_AUDIO * seg.sample_rate):
+            return
+        start = max(start, end - int(PARTIAL_WINDOW * seg.sample_rate))
+        utterance.partial_pending = True
+        utterance.partial_at = now
+        with self._lock:
+            self._partial = (utterance, np.array(seg.audio((start, end))), end)
+
+    def _on_block(self, block):
+        for span in self._segmenter.feed(block):
+            self._finish(span)
+        if self.streaming and self._segmenter.speech_start is not None:
+            self._stream_step()
+
+    # transcription side (worker thread)
+
+    def _next_job(self):
+        try:
+            return "final", self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            partial, self._partial = self._partial, None
+        if partial is not None:
+            return "partial", partial
+        try:
+            return "final", self._queue.get(timeout=0.05)
+        except queue.Empty:
+            return None, None
+
+    def _run_partial(self, utterance, audio, end):
+        if utterance.done:
+            return
+        try:
+            if utterance.plausible is None:
+                utterance.plausible = jarvis_voice.wake_word_plausible(audio)
+            if not utterance.plausible:
+                return
+            text = jarvis_voice.transcribe_raw(audio)
+            with self._lock:
+                utterance.hypotheses.append((text, end))
+        finally:
+            # also after a failed decode, or partials stop for good
+            utterance.partial_pending = False
+        command = jarvis_voice.command_from_text(text)
+        if command and self.on_partial and not utterance.done:
+            self._count("partials")
+            self.on_partial(utterance.id, command)
+
+    def _run_final(self, utterance, ended_at, audio, text):
+        try:
+            self._commit(utterance, ended_at, audio, text)
+        finally:
+            self.utterance_done.set()
+
+    def _commit(self, utterance, ended_at, audio, text):
+        if text is not None:
+            # early endpoint: the stable partial hypothesis is the transcript
+            command = jarvis_voice.command_from_text(text)
+        else:
+            command = jarvis_voice.transcribe_audio(audio)
+        self._count("transcribed")
+        if not command:
+            return
+        self._count("commands")
+        latency = round(time.monotonic() - ended_at, 2)
+        with self._lock:
+            self.stats["last_commit_latency_s"] = latency
+        logger.info(f"Heard command ({latency}s after endpoint): {command}")
+        try:
+            self.on_command(command, utterance.id)
+        except Exception:
+            logger.exception("Voice command dispatch failed")
+
+    def _run_worker(self):
+        while not self._stop.is_set():
+            kind, job = self._next_job()
+            if job is None:
+                continue
+            started = time.perf_counter()
+            try:
+                if kind == "final":
+                    self._run_final(*job)
+                else:
+                    self._run_partial(*job)
+            except Exception:
+                logger.exception("Background transcription failed")
+                self._count("errors")
+            finally:
+                self._count("transcribe_s", time.perf_counter() - started)
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self.source = self.source or MicSource(block_duration=jarvis_voice.CHUNK_DURATION)
+        self._segmenter = jarvis_voice.make_segmenter(self.source.sample_rate)
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run_worker, name="jarvis-transcriber", daemon=True)
+        self._worker.start()
+        self.source.start(self._on_block)
+        logger.info("Voice listener started")
+
+    def stop(self):
+        self._stop.set()
+        if self.source is not None:
+            self.source.stop()
+        if self._segmenter is not None:
+            jarvis_voice.remember_noise_floor(self._segmenter)
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize()
+        stats["transcribe_s"] = round(stats["transcribe_s"], 2)
+        return stats
+
+
+def listen_once(source=None, on_partial=None, timeout=5):
+    """One voice_input request: the command in the first utterance, or "".
+
+    Same streaming path as the continuous listener, so partials reach
+    on_partial(text) and a stable hypothesis ends the utterance early. As
+    with jarvis_voice.record_audio_silence, timeout only limits the wait
+    for speech to start.
+    """
+    heard = []
+    partial = (lambda utterance_id, text: on_partial(text)) if on_partial else None
+    listener = VoiceListener(lambda text, utterance_id: heard.append(text), partial, source=source)
+    listener.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while not listener.utterance_done.wait(0.05):
+            if listener.get_stats()["utterances"]:
+                continue
+            seg = listener._segmenter
+            if listener.source.finished.is_set():
+                span = seg.flush()
+                if span is None:
+                    break
+                listener._finish(span)
+            elif seg.speech_start is None and time.monotonic() >= deadline:
+                break
+    finally:
+        listener.stop()
+    return heard[0] if heard else ""
@@ -0,0 +1,197 @@
+#wake_word.py
+import random
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+import config
+from audio_io import SAMPLE_RATE, read_wav
+from logger import logger
+
+# Cheap keyword spotter that runs before Whisper. Recorded examples of the
+# wake word ("templates") and the start of each utterance are turned into
+# log-mel features and compared with subsequence DTW; only utterances that
+# come close to a template are passed on to the full transcription.
+
+TEMPLATES_DIR = Path(__file__).parent / config.VOICE.get("wake_templates_dir", "wake_templates")
+THRESHOLD = config.VOICE.get("wake_threshold", 0.3)
+SEARCH_S = config.VOICE.get("wake_search_s", 2.0)  # wake word is expected near the start
+AUDIT_RATE = config.VOICE.get("wake_audit_rate", 0.0)  # share of rejections still sent to Whisper
+
+N_FFT = 512
+HOP = SAMPLE_RATE // 100  # 10 ms
+WIN = SAMPLE_RATE // 40  # 25 ms
+N_MELS = 40
+
+_mel_fb = None
+
+
+def _mel_filterbank():
+    global _mel_fb
+    if _mel_fb is None:
+        def hz_to_mel(f):
+            return 2595.0 * np.log10(1.0 + f / 700.0)
+
+        def mel_to_hz(m):
+            return 700.0 * (10 ** (m / 2595.0) - 1.0)
+
+        mels = np.linspace(hz_to_mel(60.0), hz_to_mel(SAMPLE_RATE / 2), N_MELS + 2)
+        bins = np.floor((N_FFT + 1) * mel_to_hz(mels) / SAMPLE_RATE).astype(int)
+        fb = np.zeros((N_MELS, N_FFT // 2 + 1), dtype=np.float32)
+        for m in range(1, N_MELS + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            if center > left:
+                fb[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center:
+                fb[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+        _mel_fb = fb
+    return _mel_fb
+
+
+def log_mel(audio):
+    """(frames, N_MELS) log-mel features, mean-normalized and L2-normalized per frame."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if len(audio) < WIN:
+        audio = np.pad(audio, (0, WIN - len(audio)))
+    n_frames = 1 + (len(audio) - WIN) // HOP
+    frames = np.lib.stride_tricks.sliding_window_view(audio, WIN)[::HOP][:n_frames]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(WIN).astype(np.float32), n=N_FFT)) ** 2
+    feats = np.log(spectrum @ _mel_filterbank().T + 1e-6)
+    feats -= feats.mean(axis=0)  # cepstral-style mean normalization against channel/mic
+    norms = np.linalg.norm(feats, axis=1, keepdims=True)
+    return feats / np.maximum(norms, 1e-6)
+
+
+def subsequence_dtw(template, utterance):
+    """Best alignment cost of template anywhere inside utterance, per template frame.
+
+    Uses the (1,1), (1,2), (2,1) step pattern, which only looks at earlier
+    template rows, so every row is one vectorized update.
+    """
+    n, m = len(template), len(utterance)
+    if n == 0 or m == 0:
+        return np.inf
+    cost = 1.0 - template @ utterance.T  # cosine distance, (n, m)
+    inf = np.float32(np.inf)
+    prev2 = np.full(m, inf, dtype=np.float32)
+    prev = cost[0].copy()  # free start anywhere in the utterance
+    for i in range(1, n):
+        best = np.full(m, inf, dtype=np.float32)
+        best[1:] = prev[:-1]
+        best[2:] = np.minimum(best[2:], prev[:-2])
+        if i > 1:
+            best[1:] = np.minimum(best[1:], prev2[:-1])
+        prev2, prev = prev, cost[i] + best
+    return float(prev.min()) / n
+
+
+class WakeWordSpotter:
+    def __init__(self, templates_dir=TEMPLATES_DIR, threshold=THRESHOLD, audit_rate=AUDIT_RATE):
+        self.templates_dir = Path(templates_dir)
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.templates = []
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.stats = {
+            "checked": 0, "accepted": 0, "rejected": 0,
+            "false_accepts": 0, "audited": 0, "false_rejects": 0,
+        }
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return self.templates
+            self._loaded = True
+            paths = sorted(self.templates_dir.glob("*.wav")) if self.templates_dir.is_dir() else []
+            for path in paths:
+                try:
+                    self.templates.append(log_mel(read_wav(path)))
+                except Exception:
+                    logger.exception(f"Bad wake word template {path}")
+            if self.templates:
+                logger.info(f"Loaded {len(self.templates)} wake word templates")
+            else:
+                logger.warning(f"No wake word templates in {self.templates_dir}, every utterance goes to Whisper")
+            return self.templates
+
+    @property
+    def ready(self):
+        return bool(self.load())
+
+    def score(self, audio):
+        """Lowest DTW distance to any template (lower is more wake-word-like)."""
+        head = log_mel(np.asarray(audio)[:int(SEARCH_S * SAMPLE_RATE)])
+        return min((subsequence_dtw(t, head) for t in self.load()), default=np.inf)
+
+    def detect(self, audio):
+        """True if audio may start with the wake word. Without templates everything passes."""
+        if not self.ready:
+            return True
+        hit = self.score(audio) <= self.threshold
+        with self._lock:
+            self.stats["checked"] += 1
+            self.stats["accepted" if hit else "rejected"] += 1
+        return hit
+
+    def should_audit(self):
+        # run Whisper on a sample of rejections so false rejects can be counted
+        return self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def record_outcome(self, accepted, transcript_has_wake_word):
+        """Feed back what Whisper heard, to count false accepts / rejects."""
+        with self._lock:
+            if accepted and not transcript_has_wake_word:
+                self.stats["false_accepts"] += 1
+            elif not accepted:
+                self.stats["audited"] += 1
+                if transcript_has_wake_word:
+                    self.stats["false_rejects"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "templates": len(self.templates), "threshold": self.threshold}
+
+
+def evaluate(spotter, positives, negatives):
+    """Score WAV fixtures and report false accept / false reject rates.
+
+    Also suggests a threshold that minimizes the total error count.
+    """
+    pos = [spotter.score(read_wav(p)) for p in positives]
+    neg = [spotter.score(read_wav(p)) for p in negatives]
+    false_rejects = sum(s > spotter.threshold for s in pos)
+    false_accepts = sum(s <= spotter.threshold for s in neg)
+
+    def errors(t):
+        return sum(s > t for s in pos) + sum(s <= t for s in neg)
+
+    # middle of the range of thresholds with the fewest total errors
+    candidates = sorted(s for s in pos + neg if np.isfinite(s))
+    suggested = spotter.threshold
+    if candidates:
+        fewest = min(errors(t) for t in candidates)
+        best = [t for t in candidates if errors(t) == fewest]
+        above = [t for t in candidates if t > best[-1]]
+        suggested = (best[-1] + above[0]) / 2 if above else best[-1]
+    return {
+        "threshold": spotter.threshold,
+        "positives": len(pos),
+        "negatives": len(neg),
+        "false_rejects": int(false_rejects),
+        "false_accepts": int(false_accepts),
+        "frr": false_rejects / len(pos) if pos else 0.0,
+        "far": false_accepts / len(neg) if neg else 0.0,
+        "suggested_threshold": round(float(suggested), 4),
+    }
+
+
+spotter = WakeWordSpotter()
+
+
+if __name__ == "__main__":
+    # python wake_word.py <fixtures dir>  (WAVs under positive/ and negative/)
+    root = Path(sys.argv[1] if len(sys.argv) > 1 else "fixtures/wake_word")
+    print(evaluate(spotter, sorted(root.glob("positive/*.wav")), sorted(root.glob("negative/*.wav"))))